@@ -0,0 +1,381 @@
+# Offline analytics over recorded sessions
+#
+# Recordings (record.py) are read in fixed-size chunks, so memory stays bounded however long
+# the sessions are, and reduced to one row per target:
+#   time_to_target  first sample within the hit radius, seconds after the spawn
+#   click_time      first click that hit, seconds after the spawn (recordings only)
+#   path_ratio      cursor path length until the hit / straight distance to the radius edge (1 = straight)
+#   overshoot       how far the cursor went past the target centre along the approach direction
+#   settle_time     last entry into the hit radius, if the cursor then stayed inside until the next target
+#   assist_share    share of the cursor motion that came from the assist rather than the user
+# Summaries are percentiles over those rows plus Fitts' law fits per distance bucket.
+#
+# Versions are compared side by side on the same input: 'recorded' is the session as it was
+# played, and any name in strategy.STRATEGIES replays the recorded raw motion through that version,
+# piece by piece through one sim.Session, so replays stay bounded as well.
+#
+#   python analyze.py sessions/*.aarec --versions recorded v1 v2 v2p1
+
+import argparse
+import math
+
+import numpy as np
+
+import record
+from record import CLICK, RECORD_DTYPE, SAMPLE, SPAWN
+from sim import HIT_RADIUS
+from strategy import STRATEGIES
+
+CHUNK = 1 << 20 # records per chunk, 22 MB
+REPLAY_CHUNK = 1 << 16 # samples per replayed piece
+DISTANCE_BUCKETS = (0, 150, 300, 450, 600, 900, 1400)
+
+COLUMNS = ('x', 'y', 'distance', 'spawn_t', 'time_to_target', 'click_time', 'path_ratio',
+           'overshoot', 'settle_time', 'assist_share', 'raw', 'assist')
+
+# First and last occurrence of each value of a sorted index array
+def _first(ids):
+    uniq, idx = np.unique(ids, return_index=True)
+    return uniq, idx
+
+def _last(ids):
+    uniq, idx = np.unique(ids[::-1], return_index=True)
+    return uniq, len(ids) - 1 - idx
+
+# Streams the records of one session, in order, into per-target rows
+class SessionAnalyzer:
+    def __init__(self, hit_radius=HIT_RADIUS):
+        self.radius = hit_radius
+        self.spawns = [] # per chunk: (x, y, t, origin x, origin y) of the targets spawned in it
+        self.partials = [] # per chunk: per-target partial reductions, merged in finish()
+
+        # Carried from one chunk to the next
+        self.pos = None # cursor position after the last sample
+        self.seg = -1 # current target, -1 before the first spawn
+        self.target = (math.nan, math.nan, math.nan, math.nan, math.nan)
+        self.hit = False # current target already reached
+        self.inside = False # last sample was inside the current target
+
+    def feed(self, records):
+        if len(records) == 0:
+            return
+        kind = records['kind']
+        t = records['t'] / 1e9
+        x = records['x'].astype(float)
+        y = records['y'].astype(float)
+        is_sample = kind == SAMPLE
+        sample = np.flatnonzero(is_sample)
+        spawn = np.flatnonzero(kind == SPAWN)
+
+        # Local target index of every record: 0 is the target carried in, each spawn opens the next
+        local = np.cumsum(kind == SPAWN)
+        first = self.seg
+
+        dx = records['dx'][sample].astype(float)
+        dy = records['dy'][sample].astype(float)
+        sx, sy = x[sample], y[sample]
+        if self.pos is None and len(sample):
+            self.pos = sx[0] - dx[0], sy[0] - dy[0]
+        # Cursor before every sample; index 0 is the carried position
+        cx = np.concatenate([[self.pos[0] if self.pos else math.nan], sx])
+        cy = np.concatenate([[self.pos[1] if self.pos else math.nan], sy])
+
+        # The origin of a target is wherever the cursor was when it spawned
+        before = np.searchsorted(sample, spawn)
+        tx = np.concatenate([[self.target[0]], x[spawn]])
+        ty = np.concatenate([[self.target[1]], y[spawn]])
+        t0 = np.concatenate([[self.target[2]], t[spawn]])
+        ox = np.concatenate([[self.target[3]], cx[before]])
+        oy = np.concatenate([[self.target[4]], cy[before]])
+        if len(spawn):
+            self.spawns.append(np.stack([tx[1:], ty[1:], t0[1:], ox[1:], oy[1:]], axis=1))
+
+        ss = local[sample]
+        keep = first + ss >= 0 # samples before the first target are not scored
+        inside_last = None
+        if keep.any():
+            inside_last = self._reduce_samples(ss[keep], t[sample][keep], sx[keep], sy[keep],
+                                               cx[:-1][keep], cy[:-1][keep], dx[keep], dy[keep], tx, ty, ox, oy, first)
+
+        clicks = np.flatnonzero((kind == CLICK) & (records['flags'] == 1) & (first + local >= 0))
+        if len(clicks):
+            uniq, idx = _first(local[clicks])
+            self.partials.append({'seg': first + uniq, 'click': t[clicks][idx] - t0[uniq]})
+
+        # Carry the state of the last target into the next chunk
+        last = local[-1]
+        if inside_last is not None and ss[keep][-1] == last:
+            self.hit = (self.hit and last == 0) or bool(inside_last.any())
+            self.inside = bool(inside_last[-1])
+        elif last != 0:
+            self.hit = self.inside = False
+        if len(sample):
+            self.pos = sx[-1], sy[-1]
+        self.seg = first + int(last)
+        self.target = (tx[last], ty[last], t0[last], ox[last], oy[last])
+
+    def _reduce_samples(self, ss, t, sx, sy, px, py, dx, dy, tx, ty, ox, oy, first):
+        r = self.radius
+        offx = sx - tx[ss]
+        offy = sy - ty[ss]
+        inside = offx**2 + offy**2 <= r * r
+
+        step = np.hypot(sx - px, sy - py)
+        raw = np.hypot(dx, dy)
+        assist = np.hypot(sx - px - dx, sy - py - dy)
+
+        # Start of each sample's target run within the chunk
+        starts = np.searchsorted(ss, ss)
+        segs, seg_starts = _first(ss)
+        carried = ss == 0
+
+        # The path counts up to and including the first sample inside the radius
+        c = np.cumsum(inside) - inside
+        reached = (c - c[starts]) > 0
+        reached |= carried & self.hit
+        path = np.add.reduceat(np.where(reached, 0.0, step), seg_starts)
+
+        # Entries into the radius; the last one is the settle time if the target ends inside
+        prev = np.empty_like(inside)
+        prev[1:] = inside[:-1]
+        prev[starts == np.arange(len(ss))] = False
+        if carried[0]:
+            prev[0] = self.inside
+        entry = inside & ~prev
+
+        appx = tx[ss] - ox[ss]
+        appy = ty[ss] - oy[ss]
+        norm = np.hypot(appx, appy)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            proj = np.where(norm > 0, (offx * appx + offy * appy) / norm, 0.0)
+
+        part = {
+            'seg': first + segs,
+            'path': path,
+            'raw': np.add.reduceat(raw, seg_starts),
+            'assist': np.add.reduceat(assist, seg_starts),
+            'overshoot': np.maximum.reduceat(np.maximum(proj, 0.0), seg_starts),
+            'hit': np.full(len(segs), math.inf),
+            'entry': np.full(len(segs), -math.inf),
+        }
+        hit_segs, idx = _first(ss[inside])
+        part['hit'][np.searchsorted(segs, hit_segs)] = t[inside][idx]
+        entry_segs, idx = _last(ss[entry])
+        part['entry'][np.searchsorted(segs, entry_segs)] = t[entry][idx]
+        last_segs, idx = _last(ss)
+        part['end_inside'] = inside[idx]
+        self.partials.append(part)
+        # Samples of the last target in the chunk, for the carried state
+        return inside[ss == ss[-1]]
+
+    def finish(self):
+        targets = np.concatenate(self.spawns) if self.spawns else np.zeros((0, 5))
+        n = len(targets)
+        path = np.zeros(n)
+        raw = np.zeros(n)
+        assist = np.zeros(n)
+        overshoot = np.zeros(n)
+        hit = np.full(n, math.inf)
+        entry = np.full(n, -math.inf)
+        click = np.full(n, math.inf)
+        end_inside = np.zeros(n, dtype=bool)
+
+        for part in self.partials:
+            seg = part['seg']
+            if 'click' in part:
+                np.minimum.at(click, seg, part['click'])
+                continue
+            np.add.at(path, seg, part['path'])
+            np.add.at(raw, seg, part['raw'])
+            np.add.at(assist, seg, part['assist'])
+            np.maximum.at(overshoot, seg, part['overshoot'])
+            np.minimum.at(hit, seg, part['hit'])
+            np.maximum.at(entry, seg, part['entry'])
+            # Partials are in time order, so the last write is the end of the target
+            end_inside[seg] = part['end_inside']
+
+        x, y, t0, ox, oy = targets.T
+        distance = np.hypot(x - ox, y - oy)
+        hit_time = np.where(np.isfinite(hit), hit - t0, np.nan)
+        reached = np.isfinite(hit)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            straight = distance - self.radius
+            path_ratio = np.where(reached & (straight > 0), path / straight, np.nan)
+            share = np.where(raw + assist > 0, assist / (raw + assist), np.nan)
+        return {
+            'x': x,
+            'y': y,
+            'distance': distance,
+            'spawn_t': t0,
+            'time_to_target': hit_time,
+            'click_time': np.where(np.isfinite(click), click, np.nan),
+            'path_ratio': path_ratio,
+            'overshoot': overshoot,
+            'settle_time': np.where(end_inside & np.isfinite(entry), entry - t0, np.nan),
+            'assist_share': share,
+            'raw': raw,
+            'assist': assist,
+        }
+
+def analyze_records(records, hit_radius=HIT_RADIUS, chunk=CHUNK):
+    analyzer = SessionAnalyzer(hit_radius)
+    for i in range(0, len(records), chunk):
+        analyzer.feed(records[i:i + chunk])
+    return analyzer.finish()
+
+# A replay in the record layout: a sample per tick and spawns just before their tick, like
+# sim._score_targets counts them. offset: ticks replayed before this trace, for its timestamps.
+def _replay_layout(trace, positions, offset=0):
+    n = len(trace)
+    out = np.zeros(n + len(trace.spawns), dtype=RECORD_DTYPE)
+    spawn_at = np.array([i for i, _, _ in trace.spawns], dtype=np.int64)
+    # Each spawn goes in front of the sample it precedes
+    sample_rows = np.arange(n) + np.searchsorted(spawn_at, np.arange(n), side='right')
+    spawn_rows = spawn_at + np.arange(len(spawn_at))
+
+    tick_ns = 1e9 / trace.rate
+    samples = out[sample_rows]
+    samples['t'] = np.round((offset + np.arange(n) + 1) * tick_ns)
+    samples['kind'] = SAMPLE
+    samples['dx'], samples['dy'] = trace.deltas[:, 0], trace.deltas[:, 1]
+    samples['x'], samples['y'] = positions[:, 0], positions[:, 1]
+    out[sample_rows] = samples
+
+    spawns = out[spawn_rows]
+    spawns['t'] = np.round((offset + spawn_at) * tick_ns)
+    spawns['kind'] = SPAWN
+    spawns['x'] = [x for _, x, _ in trace.spawns]
+    spawns['y'] = [y for _, _, y in trace.spawns]
+    out[spawn_rows] = spawns
+    return out
+
+def replay_records(trace, version, **kwargs):
+    from sim import simulate
+
+    return _replay_layout(trace, simulate(trace, version, **kwargs).positions)
+
+# Replays consecutive pieces of one session (record.iter_traces, sim.split) through one
+# sim.Session, yielding each piece's replay in the record layout
+def replay_stream(pieces, version, **kwargs):
+    from sim import Session
+
+    session = None
+    offset = 0
+    for trace in pieces:
+        if session is None:
+            session = Session(version, trace.start, trace.rate, **kwargs)
+        yield _replay_layout(trace, session.run(trace).positions, offset)
+        offset += len(trace)
+
+# Per-target rows of one session for one version
+def analyze_session(path, version='recorded', hit_radius=HIT_RADIUS, chunk=CHUNK, **kwargs):
+    if version == 'recorded':
+        if not path.endswith('.aarec'):
+            raise ValueError(f"{path} has no recorded cursor positions, only replays can be analyzed")
+        records, _ = record.load(path)
+        return analyze_records(records, hit_radius, chunk)
+
+    # Replays are fed piece by piece, so only one piece of the replay is alive at a time
+    analyzer = SessionAnalyzer(hit_radius)
+    if path.endswith('.aarec'):
+        records, rate = record.load(path)
+        pieces = record.iter_traces(records, rate, REPLAY_CHUNK, chunk)
+    else:
+        from sim import Trace, split
+        pieces = split(Trace.load(path), REPLAY_CHUNK)
+    for replay in replay_stream(pieces, version, **kwargs):
+        for i in range(0, len(replay), chunk):
+            analyzer.feed(replay[i:i + chunk])
+    return analyzer.finish()
+
+def concat(tables):
+    return {name: np.concatenate([t[name] for t in tables]) if tables else np.zeros(0) for name in COLUMNS}
+
+# Movement time against the index of difficulty log2(D / W + 1), W = 2 * hit radius, fitted as
+# MT = a + b * ID per bucket of target distance. Clicks are used as the movement time where
+# there are any, otherwise the first sample inside the radius.
+def fitts(table, hit_radius=HIT_RADIUS, buckets=DISTANCE_BUCKETS):
+    mt = np.where(np.isfinite(table['click_time']), table['click_time'], table['time_to_target'])
+    d = table['distance']
+    ok = np.isfinite(mt) & (mt > 0) & (d > 0)
+    mt, d = mt[ok], d[ok]
+    index = np.log2(d / (2 * hit_radius) + 1)
+
+    edges = list(buckets) + [math.inf]
+    which = np.digitize(d, edges) - 1
+    fits = []
+    for b in range(len(buckets)):
+        fits.append(_fit(edges[b], edges[b + 1], index[which == b], mt[which == b]))
+    fits.append(_fit(edges[0], math.inf, index, mt))
+    return fits
+
+def _fit(lo, hi, index, mt):
+    fit = {'lo': lo, 'hi': hi, 'n': int(len(mt)), 'a': math.nan, 'b': math.nan,
+           'throughput': float(np.mean(index / mt)) if len(mt) else math.nan}
+    if len(mt) >= 3 and np.ptp(index) > 0:
+        fit['b'], fit['a'] = (float(v) for v in np.polyfit(index, mt, 1))
+    return fit
+
+def _percentiles(values, qs=(10, 50, 90)):
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return [math.nan] * len(qs)
+    return np.percentile(values, qs).tolist()
+
+def summarize(table, hit_radius=HIT_RADIUS):
+    n = len(table['x'])
+    ttt = _percentiles(table['time_to_target'])
+    total = table['raw'].sum() + table['assist'].sum()
+    return {
+        'targets': n,
+        'missed': int(np.isnan(table['time_to_target']).sum()),
+        'time_to_target_p10': ttt[0],
+        'time_to_target_p50': ttt[1],
+        'time_to_target_p90': ttt[2],
+        'click_time_p50': _percentiles(table['click_time'])[1],
+        'path_ratio_p50': _percentiles(table['path_ratio'])[1],
+        'overshoot_mean': float(table['overshoot'].mean()) if n else math.nan,
+        'overshoot_p90': _percentiles(table['overshoot'])[2],
+        'settle_time_p50': _percentiles(table['settle_time'])[1],
+        'assist_share': float(table['assist'].sum() / total) if total > 0 else math.nan,
+        'fitts': fitts(table, hit_radius),
+    }
+
+# Streams every session through every version; only the per-target rows are kept
+def analyze(paths, versions=('recorded',), hit_radius=HIT_RADIUS, chunk=CHUNK, **kwargs):
+    tables = {version: [] for version in versions}
+    for path in paths:
+        for version in versions:
+            if version != 'recorded' and version not in STRATEGIES:
+                raise ValueError(f"Unknown version: {version}")
+            tables[version].append(analyze_session(path, version, hit_radius, chunk, **kwargs))
+    return {version: summarize(concat(t), hit_radius) for version, t in tables.items()}
+
+def print_report(report):
+    versions = list(report)
+    print(f"{'':24s}" + ''.join(f"{v:>12s}" for v in versions))
+    for metric in report[versions[0]]:
+        if metric == 'fitts':
+            continue
+        print(f"{metric:24s}" + ''.join(f"{report[v][metric]:12.4g}" for v in versions))
+
+    print("\nFitts' law per distance bucket: MT = a + b * ID (s), throughput (bits/s)")
+    for i, fit in enumerate(report[versions[0]]['fitts']):
+        label = f"{fit['lo']:.0f}-{fit['hi']:.0f}px" if math.isfinite(fit['hi']) else f"{fit['lo']:.0f}px+"
+        if i == len(report[versions[0]]['fitts']) - 1:
+            label = 'all'
+        cells = []
+        for v in versions:
+            f = report[v]['fitts'][i]
+            cells.append(f"n={f['n']:<5d} a={f['a']:6.3f} b={f['b']:6.3f} tp={f['throughput']:5.2f}")
+        print(f"  {label:12s}" + '  |  '.join(cells))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Analyze recorded sessions')
+    parser.add_argument('sessions', nargs='+', help='.aarec recordings (or .npz traces for replays)')
+    parser.add_argument('--versions', nargs='+', default=['recorded'], help="'recorded' and/or v1, v2, v2p1")
+    parser.add_argument('--radius', type=float, default=HIT_RADIUS)
+    parser.add_argument('--chunk', type=int, default=CHUNK)
+    args = parser.parse_args()
+
+    print_report(analyze(args.sessions, args.versions, args.radius, args.chunk))
@@ -0,0 +1,100 @@
+# Cursor backends
+#
+# Everything the assists need from a cursor: raw relative motion, the current position and a
+# way to move it. The same assist code then runs against pygame in the trainer, an in-memory
+# cursor in headless replay and benchmarks, or a batched backend that writes once per tick.
+
+class CursorBackend:
+    # Motion since the last call, as (dx, dy)
+    def get_rel(self):
+        raise NotImplementedError
+
+    def get_pos(self):
+        raise NotImplementedError
+
+    # set_pos(x, y) or set_pos((x, y))
+    def set_pos(self, x, y=None):
+        raise NotImplementedError
+
+    # Pushes out anything the backend has been holding back; called once per tick
+    def flush(self):
+        pass
+
+class PygameBackend(CursorBackend):
+    def __init__(self):
+        import pygame
+        self.mouse = pygame.mouse
+
+    def get_rel(self):
+        return self.mouse.get_rel()
+
+    def get_pos(self):
+        return self.mouse.get_pos()
+
+    def set_pos(self, x, y=None):
+        if y is None:
+            x, y = x
+        self.mouse.set_pos(x, y)
+
+# In-memory cursor for tests, simulation and benchmarks. set_pos truncates to integers like
+# SDL does unless integer=False.
+class VirtualMouse(CursorBackend):
+    def __init__(self, pos=(0, 0), integer=True):
+        self.integer = integer
+        self.x, self.y = pos
+        self.rel_x, self.rel_y = 0, 0
+
+    # Raw device motion
+    def move(self, dx, dy):
+        self.x += dx
+        self.y += dy
+        self.rel_x += dx
+        self.rel_y += dy
+
+    def get_rel(self):
+        rel = self.rel_x, self.rel_y
+        self.rel_x, self.rel_y = 0, 0
+        return rel
+
+    def get_pos(self):
+        return self.x, self.y
+
+    def set_pos(self, x, y=None):
+        if y is None:
+            x, y = x
+        if self.integer:
+            x, y = int(x), int(y)
+        self.x, self.y = x, y
+
+# Coalesces every set_pos of a tick into one write on flush(), and drops the write entirely
+# when the cursor would not move. Reads see the pending position.
+class BatchedBackend(CursorBackend):
+    def __init__(self, backend):
+        self.backend = backend
+        self.pending = None
+        self.writes = 0
+
+    def get_rel(self):
+        return self.backend.get_rel()
+
+    def get_pos(self):
+        if self.pending is not None:
+            return self.pending
+        return self.backend.get_pos()
+
+    def set_pos(self, x, y=None):
+        if y is None:
+            x, y = x
+        self.pending = x, y
+
+    def flush(self):
+        if self.pending is None:
+            return
+        pending, self.pending = self.pending, None
+        if tuple(self.backend.get_pos()) != pending:
+            self.backend.set_pos(*pending)
+            self.writes += 1
+
+    # Raw motion and anything else backend-specific go to the wrapped backend
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
@@ -0,0 +1,228 @@
+# Benchmarks
+#
+#   python bench.py run --out before.json [--traces a.aarec b.npz] [--quick]
+#   python bench.py compare before.json after.json [--threshold 10]
+#
+# Cold import of the assist engine is timed in fresh interpreters against IMPORT_BUDGET_MS,
+# and fails if any of the heavy tooling dependencies got pulled in.
+#
+# Microbenchmarks time the helpers on fixed inputs (best of several repeats, ns per call).
+# Per-sample benchmarks replay traces through sim.simulate() with instrument.Probes on the
+# per-sample entry point of each version and check p99 against the 500 us budget
+# (2000 Hz control loop).
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+
+import numpy as np
+
+import debuglog
+from strategy import STRATEGIES
+
+BUDGET_NS = 500_000
+
+# Everything the trainer, the simulator and the tuner need to run an assist. NumPy alone is
+# about 100 ms of this on a typical machine; the engine modules themselves add a few ms.
+IMPORT_BUDGET_MS = 250
+ENGINE_MODULES = ('backend', 'cubic', 'v1', 'v2', 'v2p1', 'strategy', 'profiles', 'sim')
+HEAVY_MODULES = ('matplotlib', 'scipy', 'pygame', 'ipywidgets')
+
+# Per-sample entry point of each version
+ENTRY_POINTS = {name: cls.entry_point for name, cls in STRATEGIES.items()}
+
+def _micro_cases():
+    from cubic import MonotoneCubic
+    import v2
+    import v2p1
+
+    cubic = MonotoneCubic(175, 250, 0.5, 5.0, 0.5, 500)
+    reversed_cubic = MonotoneCubic(150, 350, 1, 3, 1, 500, reversed=True)
+    xs = np.linspace(0, 500, 1000)
+    rng = np.random.default_rng(0)
+    px, py = rng.uniform(0, 1200, 1000), rng.uniform(0, 700, 1000)
+
+    cases = {
+        'cubic.F': lambda: cubic.F(312.5),
+        'cubic.F_as_ratio': lambda: cubic.F_as_ratio(312.5),
+        'cubic.F_as_ratio[reversed]': lambda: reversed_cubic.F_as_ratio(312.5),
+        'cubic.F[1000]': lambda: cubic.F(xs),
+        'v2p1.gaussian_filter': lambda: v2p1.gaussian_filter(700.0, 480.0, 720, 500),
+        'v2p1.gaussian_filter_batch[1000]': lambda: v2p1.gaussian_filter_batch(px, py, 720, 500),
+        'v2.force_field': lambda: v2.force_field(700.0, 480.0, (720, 500), 1000.0, 675.0),
+        'v2.alpha_function': lambda: v2.alpha_function(28.3, 150.0, 1.125),
+        'v2.force_field_batch[1000]': lambda: v2.force_field_batch(px, py, 720, 500, 1000.0, 675.0, 150.0, 1.125, 5.0),
+    }
+    try:
+        import v1
+        cases['v1.check_angle'] = lambda: v1.check_angle((100, 100), (110, 104), (400, 200), 23.2)
+    except ImportError:
+        pass
+    return cases
+
+def run_micro(repeat=5, quick=False):
+    results = {}
+    # check_angle logs on every call
+    with debuglog.suppressed():
+        for name, fn in _micro_cases().items():
+            timer = timeit.Timer(fn)
+            number, _ = timer.autorange()
+            if quick:
+                number = max(1, number // 10)
+            best = min(timer.repeat(repeat=2 if quick else repeat, number=number)) / number
+            results[name] = {'ns_per_call': round(best * 1e9, 1)}
+    return results
+
+def _load_traces(paths, quick):
+    if paths:
+        from tune import load_trace
+        return [load_trace(p) for p in paths]
+
+    # No recordings given: a fixed synthetic session
+    from sim import straight_trace
+    rng = np.random.default_rng(0)
+    n = 10 if quick else 60
+    targets = [tuple(p) for p in rng.integers((70, 70), (1130, 630), size=(n, 2)).tolist()]
+    return [straight_trace(targets)]
+
+def run_per_sample(paths=None, quick=False):
+    from instrument import Probes
+    from sim import simulate
+
+    traces = _load_traces(paths, quick)
+    results = {}
+    for version, entry in ENTRY_POINTS.items():
+        probes = Probes()
+        try:
+            for trace in traces:
+                simulate(trace, version, probes=probes)
+        except ImportError as e:
+            results[version] = {'skipped': str(e)}
+            continue
+
+        summary = probes.histogram(entry).summary()
+        summary['entry_point'] = entry
+        summary['budget_ns'] = BUDGET_NS
+        summary['margin_ns'] = BUDGET_NS - summary['p99_ns']
+        # A histogram with no samples proves nothing: the entry point was never timed
+        summary['within_budget'] = summary['count'] > 0 and summary['p99_ns'] < BUDGET_NS
+        results[version] = summary
+    return results
+
+_IMPORT_PROBE = '''
+import json, sys, time
+t = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+print(json.dumps({{'ms': (time.perf_counter() - t) * 1000, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+# Best of `repeat` fresh interpreters
+def run_import(repeat=5, quick=False):
+    code = _IMPORT_PROBE.format(modules=ENGINE_MODULES, heavy=HEAVY_MODULES)
+    here = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(2 if quick else repeat):
+        out = subprocess.run([sys.executable, '-c', code], cwd=here, capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    best = min(r['ms'] for r in runs)
+    heavy = sorted({m for r in runs for m in r['heavy']})
+    return {
+        'modules': list(ENGINE_MODULES),
+        'ms': round(best, 1),
+        'budget_ms': IMPORT_BUDGET_MS,
+        'heavy_modules': heavy,
+        'within_budget': best < IMPORT_BUDGET_MS and not heavy,
+    }
+
+def environment():
+    return {
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+def run(paths=None, quick=False):
+    return {
+        'environment': environment(),
+        'micro': run_micro(quick=quick),
+        'per_sample': run_per_sample(paths, quick),
+        'import': run_import(quick=quick),
+    }
+
+# Returns (name, metric, old, new, change %) for everything slower by more than threshold %
+def compare(old, new, threshold=10.0):
+    regressions = []
+    rows = []
+    for name, result in new['micro'].items():
+        if name in old['micro']:
+            rows.append((f"micro/{name}", 'ns_per_call', old['micro'][name]['ns_per_call'], result['ns_per_call']))
+    for name, result in new['per_sample'].items():
+        before = old['per_sample'].get(name, {})
+        for metric in ('p50_ns', 'p99_ns'):
+            if metric in result and metric in before:
+                rows.append((f"per_sample/{name}", metric, before[metric], result[metric]))
+    if 'import' in old and 'import' in new:
+        rows.append(("import", 'ms', old['import']['ms'], new['import']['ms']))
+
+    for name, metric, a, b in rows:
+        change = (b - a) / a * 100 if a else 0.0
+        if change > threshold:
+            regressions.append((name, metric, a, b, change))
+    return rows, regressions
+
+def _print_run(results):
+    print("Microbenchmarks")
+    for name, r in results['micro'].items():
+        print(f"  {name:36s} {r['ns_per_call'] / 1000:10.3f} us")
+    print(f"Per sample (budget {BUDGET_NS / 1000:.0f} us)")
+    for version, r in results['per_sample'].items():
+        if 'skipped' in r:
+            print(f"  {version:6s} skipped: {r['skipped']}")
+            continue
+        status = 'OK' if r['within_budget'] else 'OVER BUDGET' if r['count'] else 'NO SAMPLES'
+        print(f"  {version:6s} {r['entry_point']:16s} p50 {r['p50_ns'] / 1000:8.1f} us  p99 {r['p99_ns'] / 1000:8.1f} us  "
+              f"max {r['max_ns'] / 1000:8.1f} us  margin {r['margin_ns'] / 1000:8.1f} us  {status}")
+    r = results['import']
+    status = 'OK' if r['within_budget'] else 'OVER BUDGET'
+    heavy = f"  pulled in {', '.join(r['heavy_modules'])}" if r['heavy_modules'] else ''
+    print(f"Cold import of the engine (budget {r['budget_ms']} ms)")
+    print(f"  {r['ms']:8.1f} ms  {status}{heavy}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Aim assist benchmarks')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_run = sub.add_parser('run')
+    p_run.add_argument('--out', help='write results as JSON')
+    p_run.add_argument('--traces', nargs='*', help='recorded traces (.aarec or .npz); default is a synthetic session')
+    p_run.add_argument('--quick', action='store_true')
+    p_cmp = sub.add_parser('compare')
+    p_cmp.add_argument('old')
+    p_cmp.add_argument('new')
+    p_cmp.add_argument('--threshold', type=float, default=10.0, help='percent slowdown that counts as a regression')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run(args.traces, args.quick)
+        _print_run(results)
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump(results, f, indent=4)
+        over = [v for v, r in results['per_sample'].items() if not r.get('within_budget', True)]
+        sys.exit(1 if over or not results['import']['within_budget'] else 0)
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        rows, regressions = compare(old, new, args.threshold)
+        for name, metric, a, b in rows:
+            change = (b - a) / a * 100 if a else 0.0
+            flag = '  REGRESSION' if change > args.threshold else ''
+            print(f"{name:44s} {metric:12s} {a:12.1f} -> {b:12.1f} ({change:+6.1f}%){flag}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,106 @@
+# Fixed-rate control loop
+#
+# Runs the input/assist tick on its own schedule, independent of how long frames take to draw.
+# AdaptiveLoop does the same while there is input, and blocks while there is none.
+
+import threading
+import time
+
+# Single-slot handoff between one writer and any number of readers: the writer publishes an
+# immutable value, readers take whatever is newest. Rebinding one attribute is atomic in
+# CPython, so neither side ever blocks on a lock.
+class LatestSlot:
+    def __init__(self, value=None):
+        self._value = value
+
+    def put(self, value):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+class FixedRateLoop:
+    # rate: ticks per second
+    # spin_ns: the last part of every wait is a busy-wait, because sleep() overshoots by up to a scheduler quantum
+    # max_lag: ticks that may be missed before the schedule is reset instead of catching up in a burst
+    def __init__(self, rate, spin_ns=200_000, max_lag=4):
+        self.period_ns = int(1e9 // rate)
+        self.spin_ns = spin_ns
+        self.max_lag = max_lag
+        self.running = False
+        self.ticks = 0
+        self.missed = 0
+        self.thread = None
+
+    # tick(now_ns) is called once per period; returning False stops the loop
+    def run(self, tick):
+        self.running = True
+        deadline = time.perf_counter_ns()
+
+        while self.running:
+            now = time.perf_counter_ns()
+            wait = deadline - now
+            if wait > self.spin_ns:
+                time.sleep((wait - self.spin_ns) / 1e9)
+            while time.perf_counter_ns() < deadline:
+                pass
+
+            now = time.perf_counter_ns()
+            if tick(now) is False:
+                break
+            self.ticks += 1
+            deadline = self._next_deadline(now, deadline)
+
+        self.running = False
+
+    def _next_deadline(self, now, deadline):
+        period = self.period_ns
+        # Deadlines advance by whole periods from the schedule, not from `now`, so
+        # jitter in one tick does not accumulate as drift
+        deadline += period
+        lag = now - deadline
+        if lag > period * self.max_lag:
+            self.missed += lag // period
+            deadline = now + period
+        return deadline
+
+    def start(self, tick, name='control'):
+        self.thread = threading.Thread(target=self.run, args=(tick,), name=name, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+# FixedRateLoop that stops ticking while nothing happens. tick() calls mark_active() when it
+# sees input; after `idle_after` seconds without any, the loop calls wait(timeout), which
+# should block until there is input or `timeout` passes, instead of ticking. The tick after
+# wait() returns runs at once, so the first moving sample is not delayed, and the schedule
+# restarts from it. `resumed` is True during that tick.
+class AdaptiveLoop(FixedRateLoop):
+    def __init__(self, rate, wait, idle_after=0.1, idle_timeout=0.1, **kwargs):
+        super().__init__(rate, **kwargs)
+        self.wait = wait
+        self.idle_after_ns = int(idle_after * 1e9)
+        self.idle_timeout = idle_timeout
+        self.active = True
+        self.last_active_ns = time.perf_counter_ns()
+        self.resumed = False
+        self.idle_waits = 0
+
+    def mark_active(self):
+        self.active = True
+
+    def _next_deadline(self, now, deadline):
+        self.resumed = False
+        if self.active:
+            self.active = False
+            self.last_active_ns = now
+        elif now - self.last_active_ns > self.idle_after_ns:
+            self.wait(self.idle_timeout)
+            self.idle_waits += 1
+            self.resumed = True
+            return time.perf_counter_ns()
+        return super()._next_deadline(now, deadline)
@@ -1,9 +1,39 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.interpolate import PchipInterpolator
+
+_PARAMS = ('a', 'b', 'k1', 'k2', 'k3', 's', 'reversed', 'lut_size')
+
+def _sign(v):
+    return (v > 0) - (v < 0)
+
+# Same derivatives as scipy's PchipInterpolator (Fritsch-Butland, non-centered 3-point edges)
+def _pchip_slopes(xs, ys):
+    h = [xs[i + 1] - xs[i] for i in range(len(xs) - 1)]
+    m = [(ys[i + 1] - ys[i]) / h[i] for i in range(len(h))]
+
+    d = [0.0] * len(xs)
+    for i in range(1, len(xs) - 1):
+        if _sign(m[i - 1]) != _sign(m[i]) or m[i - 1] == 0 or m[i] == 0:
+            continue
+        w1 = 2 * h[i] + h[i - 1]
+        w2 = h[i] + 2 * h[i - 1]
+        d[i] = (w1 + w2) / (w1 / m[i - 1] + w2 / m[i])
+
+    def edge(h0, h1, m0, m1):
+        e = ((2 * h0 + h1) * m0 - h0 * m1) / (h0 + h1)
+        if _sign(e) != _sign(m0):
+            return 0.0
+        if _sign(m0) != _sign(m1) and abs(e) > 3 * abs(m0):
+            return 3.0 * m0
+        return e
+
+    d[0] = edge(h[0], h[1], m[0], m[1])
+    d[-1] = edge(h[-1], h[-2], m[-1], m[-2])
+    return h, m, d
 
 class MonotoneCubic:
-    def __init__(self, a, b, k1, k2, k3, s, reversed=False):
+    # The curve is compiled into a per-segment coefficient table once, and rebuilt only when
+    # a parameter changes. lut_size > 0 additionally samples it into a dense LUT.
+    def __init__(self, a, b, k1, k2, k3, s, reversed=False, lut_size=0):
         self.a = a
         self.b = b
         self.k1 = k1
@@ -11,47 +41,95 @@ class MonotoneCubic:
         self.k3 = k3
         self.s = s
         self.reversed = reversed
-        
-    def F(self, x):
+        self.lut_size = lut_size
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in _PARAMS:
+            object.__setattr__(self, '_coeffs', None)
+
+    def _build(self):
         points_x = [0, self.a, self.b, self.s]
         y0 = 0
         y1 = y0 + self.k1 * self.a
         y2 = y1 + self.k2 * (self.b - self.a)
         y3 = y2 + self.k3 * (self.s - self.b)
         points_y = [y0, y1, y2, y3]
-        interpolator = PchipInterpolator(points_x, points_y)
-        
+
+        h, m, d = _pchip_slopes(points_x, points_y)
+
+        # y = c0 + c1 * t + c2 * t^2 + c3 * t^3, t = x - x_i
+        coeffs = []
+        for i in range(3):
+            c2 = (3 * m[i] - 2 * d[i] - d[i + 1]) / h[i]
+            c3 = (d[i] + d[i + 1] - 2 * m[i]) / h[i]**2
+            coeffs.append((points_x[i], float(points_y[i]), d[i], c2, c3))
+
+        self._knots = (points_x[1], points_x[2])
+        self._coeffs = tuple(coeffs)
+        self._coeff_array = np.array(coeffs, dtype=float)
+        self._total = self._eval_scalar(self.s)
+
+        if self.lut_size:
+            self._lut_x = np.linspace(0, self.s, self.lut_size)
+            self._lut_y = self._eval_array(self._lut_x)
+            self._lut_step = self.s / (self.lut_size - 1)
+
+    # Builds the tables now instead of on the first evaluation
+    def compile(self):
+        if self._coeffs is None:
+            self._build()
+        return self
+
+    # ((a, b), (3, 5) rows of (x0, c0, c1, c2, c3), F(s)): the compiled curve as plain arrays,
+    # for evaluating many different curves at once (see lockstep.py)
+    def table(self):
+        self.compile()
+        return self._knots, self._coeff_array, self._total
+
+    def _eval_scalar(self, x):
+        a, b = self._knots
+        x0, c0, c1, c2, c3 = self._coeffs[0 if x < a else 1 if x < b else 2]
+        t = x - x0
+        return c0 + t * (c1 + t * (c2 + t * c3))
+
+    def _eval_array(self, x):
+        idx = np.searchsorted(self._knots, x, side='right')
+        x0, c0, c1, c2, c3 = self._coeff_array[idx].T
+        t = x - x0
+        return c0 + t * (c1 + t * (c2 + t * c3))
+
+    def _eval_lut(self, x):
+        if isinstance(x, (int, float)) or np.ndim(x) == 0:
+            # Outside [0, s] the cubic extrapolation is kept, as with the coefficient table
+            if x < 0 or x > self.s:
+                return self._eval_scalar(x)
+            pos = x / self._lut_step
+            i = min(int(pos), self.lut_size - 2)
+            f = pos - i
+            return self._lut_y[i] + (self._lut_y[i + 1] - self._lut_y[i]) * f
+        inside = (x >= 0) & (x <= self.s)
+        return np.where(inside, np.interp(x, self._lut_x, self._lut_y), self._eval_array(x))
+
+    def F(self, x):
+        if self._coeffs is None:
+            self._build()
+
         if self.reversed:
-            return interpolator(self.s - x)
-        return interpolator(x)
+            x = self.s - x
+
+        if self.lut_size:
+            return self._eval_lut(x)
+        if isinstance(x, (int, float)) or np.ndim(x) == 0:
+            return self._eval_scalar(x)
+        return self._eval_array(np.asarray(x, dtype=float))
 
+    # F(x) over the top of the curve, the unreversed F(s), in either direction: 0 -> 1 over
+    # [0, s], or 1 -> 0 if reversed. The original divided by F(s) as evaluated, which for a
+    # reversed curve is F at 0, i.e. 0, and so gave inf or nan everywhere (the slider path of
+    # v2p1 runs on the reversed speed_cubic). F itself is unchanged and matches scipy's
+    # PchipInterpolator.
     def F_as_ratio(self, x):
-        return self.F(x) / self.F(self.s)
-
-if __name__ == "__main__":
-    # 파라미터 설정
-    a = 150      # 첫 번째 전환점
-    b = 350      # 두 번째 전환점
-    k1 = 1      # 첫 번째 구간 기울기
-    k2 = 3      # 두 번째 구간 기울기
-    k3 = 1      # 세 번째 구간 기울기
-    s = 500
-
-    # 인터폴레이터 생성
-    cubic = MonotoneCubic(a, b, k1, k2, k3, s, reversed=True)
-
-    # x 값 생성
-    x = np.linspace(0, s, s)
-    y = cubic.F(x)
-
-    plt.figure(figsize=(10, 6))
-    plt.plot(x, y, label='Monotonic Cubic Function (PCHIP)', color='blue')
-    plt.axvline(x=a, color='red', linestyle='--', label='a (전환점)')
-    plt.axvline(x=b, color='green', linestyle='--', label='b (전환점)')
-    plt.scatter([0, a, b, s], [cubic.F(0), cubic.F(a), cubic.F(b), cubic.F(s)], color='black')  # 키 포인트 표시
-    plt.xlabel('x')
-    plt.ylabel('f(x)')
-    plt.title('Monotonic Cubic S-Shaped Function using PCHIP')
-    plt.legend()
-    plt.grid(True)
-    plt.show()
+        if self._coeffs is None:
+            self._build()
+        return self.F(x) / self._total
@@ -0,0 +1,86 @@
+# Debug output of the per-sample paths
+#
+# A print() in a 2 kHz loop is a console write on every sample. A DebugLog only appends the
+# format string and its arguments to a small ring of the newest lines; formatting and writing
+# happen at most once per `interval`, as one write of those lines plus a count of the ones
+# that were dropped. Whatever is still buffered is written at exit.
+#
+#   _debug = debuglog.get('v2')
+#   _debug('%s %s', Fx, Fy)
+#
+# AIMASSIST_DEBUG selects the logs that write: unset for all of them, a comma-separated list
+# of names for only those, or empty for none.
+
+import atexit
+import contextlib
+import os
+import sys
+import time
+from collections import deque
+
+def _selected(name):
+    names = os.environ.get('AIMASSIST_DEBUG')
+    return names is None or name in names.split(',')
+
+class DebugLog:
+    # stream: default sys.stdout, looked up on every flush so that redirect_stdout applies
+    def __init__(self, name, interval=1.0, max_lines=5, stream=None, clock=time.monotonic):
+        self.name = name
+        self.interval = interval
+        self.stream = stream
+        self.clock = clock
+        self.enabled = _selected(name)
+        self.lines = deque(maxlen=max_lines)
+        self.count = 0
+        self.next_flush = 0.0
+
+    def __call__(self, fmt, *args):
+        if not self.enabled:
+            return
+        self.lines.append((fmt, args))
+        self.count += 1
+        now = self.clock()
+        if now >= self.next_flush:
+            self.flush(now)
+
+    def flush(self, now=None):
+        if self.count:
+            text = ''.join(f"[{self.name}] {fmt % args}\n" for fmt, args in self.lines)
+            dropped = self.count - len(self.lines)
+            if dropped:
+                text = f"[{self.name}] ({dropped} earlier lines dropped)\n" + text
+            (self.stream or sys.stdout).write(text)
+            self.lines.clear()
+            self.count = 0
+        self.next_flush = (self.clock() if now is None else now) + self.interval
+
+_logs = {}
+_muted = [] # what suppressed() blocks will restore, outermost first
+
+def get(name, **kwargs):
+    if name not in _logs:
+        log = _logs[name] = DebugLog(name, **kwargs)
+        if _muted:
+            _muted[0][name] = log.enabled
+            log.enabled = False
+    return _logs[name]
+
+def flush_all():
+    for log in _logs.values():
+        log.flush()
+
+atexit.register(flush_all)
+
+# Every log off, including ones created inside, e.g. for headless replay and benchmarks
+@contextlib.contextmanager
+def suppressed():
+    saved = {name: log.enabled for name, log in _logs.items()}
+    _muted.append(saved)
+    for log in _logs.values():
+        log.enabled = False
+    try:
+        yield
+    finally:
+        _muted.pop()
+        for name, log in _logs.items():
+            log.enabled = saved.get(name, log.enabled)
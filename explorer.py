@@ -0,0 +1,210 @@
+# Interactive explorer of the assist fields, for tuning by hand
+#
+# One window per version: the magnitude of the correction the assist applies at every point of
+# the screen, its direction as arrows, and a slider per constant. Moving a slider never re-plots:
+#   - each field is computed once per parameter set and grid stride and memoized (field()),
+#     so going back to a setting, or releasing a slider where it was, costs nothing
+#   - the image, the arrows and the range circle are updated in place (set_data, set_UVC)
+#   - all arrows are one quiver
+#   - while a slider is being dragged only every `coarse`-th grid point is computed; the full
+#     grid follows when the mouse is released
+#
+#   python explorer.py v2p1 --spacing 2
+#   explorer.Explorer('v2').show()        # in a notebook, with %matplotlib widget
+#
+# Like visualize.py, matplotlib is only imported when the window is built.
+
+import argparse
+import functools
+import math
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import v1
+import v2
+import v2p1
+
+# Points every `spacing` pixels of a width x height screen, with the target at (xt, yt)
+Grid = namedtuple('Grid', ['width', 'height', 'spacing', 'xt', 'yt'])
+
+# name -> (low, high, default) per version; defaults are the engine's own
+SLIDERS = {
+    'v1': {
+        'T': (0.0, 600.0, 200.0),
+        'R': (0.0, 3.0, 1.05),
+        'S': (0.0, 3.0, 0.5),
+        'heading': (-180.0, 180.0, 0.0), # direction of the motion, in degrees
+        'step': (1.0, 50.0, 10.0),       # length of the motion of one sample, in pixels
+    },
+    'v2': {
+        'U0': (0.0, 5000.0, 1000.0),
+        'sigma': (10.0, 1500.0, 675.0),
+        'R': (10.0, 600.0, 150.0),
+        'n': (0.1, 4.0, 1.125),
+        'strength': (0.0, 20.0, 5.0),
+    },
+    'v2p1': {
+        'V': (10.0, 600.0, v2p1.DEFAULT_PARAMS['V']),
+        'sigma': (5.0, 200.0, v2p1.DEFAULT_PARAMS['sigma']),
+        'k': (0.0, 1.0, v2p1.DEFAULT_PARAMS['k']),
+    },
+}
+
+# The constant drawn as a circle around the target: where the assist stops acting
+RANGE = {'v1': 'T', 'v2': 'R', 'v2p1': 'V'}
+
+def _axes(grid, stride):
+    x = np.arange(0.0, grid.width + 1, grid.spacing)[::stride]
+    y = np.arange(0.0, grid.height + 1, grid.spacing)[::stride]
+    return np.meshgrid(x, y)
+
+# v1 depends on the motion rather than on the position alone: this is the offset AimAssist.update
+# gives a sample of `step` pixels along `heading` that ended at each point, leaving out the
+# next-target mitigation, which depends on the path before it. mitigation is 1 (subpixel output).
+def _v1_field(X, Y, xt, yt, T, R, S, heading, step):
+    c = v1.compile_constants(T=T, R=R, S=S, mitigation=1.0)
+    dx = step * math.cos(math.radians(heading))
+    dy = step * math.sin(math.radians(heading))
+    if c.T <= 0:
+        return np.zeros_like(X), np.zeros_like(Y)
+    original = np.hypot(X - dx - xt, Y - dy - yt)
+    current = np.hypot(X - xt, Y - yt)
+    pullback = (c.R * 0.5 + original / c.T * c.R * 0.5) * c.mitigation - 1
+    boost = (c.S * 0.5 + original / c.T * c.S * 0.5) * c.mitigation
+    gain = np.where(original < current, pullback, boost) * (original <= c.T)
+    return dx * gain, dy * gain
+
+def _v2_field(X, Y, xt, yt, U0, sigma, R, n, strength):
+    c = v2.compile_constants(U0=U0, sigma=sigma, R=R, n=n, strength=strength, f_mitigation=1.0)
+    _, _, Fx, Fy = v2.force_field_batch(X, Y, xt, yt, c.U0, c.sigma, c.R, c.n, c.strength, c.f_mitigation)
+    return Fx, Fy
+
+def _v2p1_field(X, Y, xt, yt, V, sigma, k):
+    _, _, dx, dy = v2p1.gaussian_filter_batch(X, Y, xt, yt, V, sigma, k)
+    return dx, dy
+
+FIELDS = {'v1': _v1_field, 'v2': _v2_field, 'v2p1': _v2p1_field}
+
+# The correction (dx, dy) and its length at every `stride`-th point of `grid`; params is a tuple
+# of (name, value) pairs. The arrays are shared between callers and read-only.
+@functools.lru_cache(maxsize=128)
+def field(version, grid, params, stride=1):
+    if version not in FIELDS:
+        raise ValueError(f"Unknown version: {version}")
+    X, Y = _axes(grid, stride)
+    dx, dy = FIELDS[version](X, Y, grid.xt, grid.yt, **dict(params))
+    dx, dy = np.broadcast_to(dx, X.shape).copy(), np.broadcast_to(dy, X.shape).copy()
+    magnitude = np.hypot(dx, dy)
+    for array in dx, dy, magnitude:
+        array.flags.writeable = False
+    return dx, dy, magnitude
+
+class Explorer:
+    # spacing: pixels between grid points of the image
+    # arrows: grid points between arrows; a multiple of coarse, so that the arrows sit on the coarse grid too
+    # coarse: stride of the grid computed while a slider is dragged
+    def __init__(self, version='v2p1', width=1920, height=1080, spacing=2, arrows=24, coarse=4, params=None):
+        if version not in FIELDS:
+            raise ValueError(f"Unknown version: {version}")
+        if arrows % coarse:
+            raise ValueError(f"Invalid arrow spacing: {arrows} is not a multiple of {coarse}")
+        self.version = version
+        self.grid = Grid(width, height, spacing, width // 2, height // 2)
+        self.arrows = arrows
+        self.coarse = coarse
+        self.params = {name: default for name, (_, _, default) in SLIDERS[version].items()}
+        for name, value in (params or {}).items():
+            if name not in self.params:
+                raise KeyError(f"Unknown parameter: {name}")
+            self.params[name] = value
+        self.stride = None # of what is on screen
+        self.sliders = {}
+
+    def _key(self):
+        return tuple(sorted(self.params.items()))
+
+    def build(self):
+        import matplotlib.pyplot as plt
+        from matplotlib.widgets import Slider
+
+        g = self.grid
+        names = list(SLIDERS[self.version])
+        self.figure = plt.figure(figsize=(12, 8))
+        bottom = 0.06 + 0.04 * len(names)
+        self.ax = self.figure.add_axes([0.08, bottom + 0.04, 0.84, 0.9 - bottom])
+
+        X, Y = _axes(g, self.arrows)
+        zeros = np.zeros_like(X)
+        self.image = self.ax.imshow(np.zeros((1, 1)), extent=(0, g.width, g.height, 0), cmap='viridis',
+                                    interpolation='nearest')
+        self.quiver = self.ax.quiver(X, Y, zeros, zeros, color='white', angles='xy', scale_units='xy', scale=1.0)
+        self.circle = plt.Circle((g.xt, g.yt), 1.0, fill=False, color='red', linestyle='--')
+        self.ax.add_patch(self.circle)
+        self.ax.plot(g.xt, g.yt, 'r*', markersize=12)
+        self.ax.set_xlim(0, g.width)
+        self.ax.set_ylim(g.height, 0)
+        self.colorbar = self.figure.colorbar(self.image, ax=self.ax, label='correction (px)')
+
+        for i, name in enumerate(names):
+            low, high, _ = SLIDERS[self.version][name]
+            slider_ax = self.figure.add_axes([0.15, 0.04 + 0.04 * (len(names) - 1 - i), 0.65, 0.025])
+            slider = Slider(slider_ax, name, low, high, valinit=self.params[name])
+            slider.on_changed(functools.partial(self._changed, name))
+            self.sliders[name] = slider
+        self.figure.canvas.mpl_connect('button_release_event', self._released)
+        self.update()
+        return self
+
+    def _changed(self, name, value):
+        self.params[name] = value
+        dragging = any(s.drag_active for s in self.sliders.values())
+        self.update(self.coarse if dragging else 1)
+
+    def _released(self, event):
+        if self.stride != 1:
+            self.update()
+
+    # Redraws at `stride` with the current parameters, reusing every artist
+    def update(self, stride=1):
+        started = time.perf_counter()
+        cached = field.cache_info().hits
+        dx, dy, magnitude = field(self.version, self.grid, self._key(), stride)
+        cached = field.cache_info().hits > cached
+        elapsed = (time.perf_counter() - started) * 1e3
+
+        peak = float(magnitude.max())
+        self.image.set_data(magnitude)
+        self.image.set_clim(0, peak or 1.0)
+
+        # Arrows scaled so that the longest one spans the gap to the next
+        step = self.arrows // stride
+        self.quiver.scale = peak / (self.arrows * self.grid.spacing) if peak else 1.0
+        self.quiver.set_UVC(dx[::step, ::step], dy[::step, ::step])
+
+        self.circle.set_radius(self.params[RANGE[self.version]])
+        rows, cols = dx.shape
+        source = 'cached' if cached else f"{elapsed:.1f} ms"
+        self.ax.set_title(f"{self.version}: {cols}x{rows} points, {source}, peak {peak:.2f} px")
+        self.stride = stride
+        self.figure.canvas.draw_idle()
+
+    def show(self):
+        import matplotlib.pyplot as plt
+
+        if not self.sliders:
+            self.build()
+        plt.show()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Explore the assist fields with sliders')
+    parser.add_argument('version', nargs='?', choices=list(FIELDS), default='v2p1')
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--spacing', type=int, default=2, help='pixels between grid points')
+    parser.add_argument('--arrows', type=int, default=24, help='grid points between arrows')
+    parser.add_argument('--coarse', type=int, default=4, help='grid stride while a slider is dragged')
+    args = parser.parse_args()
+
+    Explorer(args.version, args.width, args.height, args.spacing, args.arrows, args.coarse).show()
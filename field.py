@@ -0,0 +1,137 @@
+# Multi-target field engine
+#
+# Combines the per-target fields of v2 (force_field * alpha_function) or v2.1 (gaussian_filter)
+# over any number of live targets. Targets live in a uniform grid whose cells are as large as
+# the biggest radius, so a sample only looks at the 3x3 cells around the cursor instead of
+# every target on screen.
+
+import math
+
+import v2
+import v2p1
+
+class Target:
+    __slots__ = ('id', 'x', 'y', 'weight', 'radius', 'priority', 'cell')
+
+    def __init__(self, id, x, y, weight, radius, priority):
+        self.id = id
+        self.x = x
+        self.y = y
+        self.weight = weight
+        self.radius = radius
+        self.priority = priority
+        self.cell = None
+
+class TargetField:
+    # kind: 'gaussian' (v2.1, params V, sigma, k) or 'force' (v2, params U0, sigma, R, n, strength, f_mitigation)
+    # max_active: only the highest-priority targets in range contribute, at most this many (None = all)
+    def __init__(self, kind='gaussian', max_active=None, **params):
+        if kind == 'gaussian':
+            self.params = {'V': 160.0, 'sigma': 51.9, 'k': 0.5}
+        elif kind == 'force':
+            self.params = {'U0': 1000.0, 'sigma': 675.0, 'R': 150.0, 'n': 1.125, 'strength': 5.0, 'f_mitigation': 1.0}
+        else:
+            raise ValueError(f"Unknown field kind: {kind}")
+        self.params.update(params)
+        self.kind = kind
+        self.max_active = max_active
+
+        self.default_radius = self.params['V' if kind == 'gaussian' else 'R']
+        self.cell_size = self.default_radius
+        self.grid = {}
+        self.targets = {}
+        self.next_id = 0
+
+    # Same constants as an existing v2.AimAssist or v2p1.AimAssistV2p1
+    @classmethod
+    def from_assist(cls, assist, **kwargs):
+        if hasattr(assist, 'U0'):
+            return cls('force', U0=assist.U0, sigma=assist.sigma, R=assist.R, n=assist.n,
+                       strength=assist.strength, f_mitigation=assist.f_mitigation, **kwargs)
+        return cls('gaussian', V=assist.V, sigma=assist.sigma, k=assist.k, **kwargs)
+
+    def _cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def _insert(self, t):
+        t.cell = self._cell(t.x, t.y)
+        self.grid.setdefault(t.cell, []).append(t)
+
+    def _unlink(self, t):
+        bucket = self.grid[t.cell]
+        bucket.remove(t)
+        if not bucket:
+            del self.grid[t.cell]
+
+    def add(self, x, y, weight=1.0, radius=None, priority=0):
+        radius = self.default_radius if radius is None else radius
+        t = Target(self.next_id, x, y, weight, radius, priority)
+        self.next_id += 1
+        self.targets[t.id] = t
+        if radius > self.cell_size:
+            # Cells must cover the largest radius for the 3x3 query to stay exact
+            self.cell_size = radius
+            self._rebuild()
+        else:
+            self._insert(t)
+        return t.id
+
+    def remove(self, id):
+        t = self.targets.pop(id)
+        self._unlink(t)
+
+    def move(self, id, x, y):
+        t = self.targets[id]
+        t.x, t.y = x, y
+        cell = self._cell(x, y)
+        if cell != t.cell:
+            self._unlink(t)
+            self._insert(t)
+
+    def clear(self):
+        self.grid.clear()
+        self.targets.clear()
+
+    def _rebuild(self):
+        self.grid.clear()
+        for t in self.targets.values():
+            self._insert(t)
+
+    # Targets whose radius contains (x, y)
+    def in_range(self, x, y):
+        cx, cy = self._cell(x, y)
+        found = []
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for t in self.grid.get((i, j), ()):
+                    if (x - t.x)**2 + (y - t.y)**2 <= t.radius**2:
+                        found.append(t)
+        if self.max_active is not None and len(found) > self.max_active:
+            found.sort(key=lambda t: -t.priority)
+            found = found[:self.max_active]
+        return found
+
+    def delta(self, x, y):
+        p = self.params
+        dx, dy = 0.0, 0.0
+        for t in self.in_range(x, y):
+            if self.kind == 'gaussian':
+                _, _, tdx, tdy = v2p1.gaussian_filter(x, y, t.x, t.y, t.radius, p['sigma'], p['k'])
+            else:
+                tdx, tdy = v2.force_field(x, y, (t.x, t.y), p['U0'], p['sigma'])
+                alpha = v2.alpha_function(math.hypot(x - t.x, y - t.y), t.radius, p['n']) * p['strength']
+                tdx, tdy = tdx * alpha, tdy * alpha
+            dx += t.weight * tdx
+            dy += t.weight * tdy
+
+        if self.kind == 'force':
+            # Same small-force inflation as v2.AimAssist.get_fx_fy, applied to the combined force
+            if abs(dx) < 1:
+                dx *= p['f_mitigation']
+            if abs(dy) < 1:
+                dy *= p['f_mitigation']
+        return dx, dy
+
+    def apply(self, x, y):
+        dx, dy = self.delta(x, y)
+        return x + dx, y + dy, dx, dy
@@ -0,0 +1,220 @@
+# Latency and jitter instrumentation
+#
+# Per-stage timers and loop-period jitter go into HDR-style histograms, set_position calls
+# into counters. On the hot path a timed call is two perf_counter_ns() reads and a list append;
+# bucketing happens in bulk with NumPy. Only one stage per sample is timed, since every timer
+# also adds its own cost to the stages around it, and with `every` > 1 only every n-th call.
+
+import json
+import time
+
+import numpy as np
+
+class Histogram:
+    # Log-linear buckets like HdrHistogram: 2**sub_bits linear sub-buckets per power of two,
+    # so every value is kept to within 2**-(sub_bits - 1) relative error.
+    def __init__(self, sub_bits=5, fold_at=8192):
+        self.sub_bits = sub_bits
+        self.fold_at = fold_at
+        self.counts = np.zeros(64 << sub_bits, dtype=np.int64) # any 63-bit nanosecond value
+        self.pending = []
+        self.reset()
+
+    def reset(self):
+        self.counts[:] = 0
+        self.pending.clear()
+        self.n = 0
+        self.total = 0
+        self.max = 0
+
+    # Appends only; the raw values are bucketed in bulk by fold()
+    def record(self, v):
+        self.pending.append(v)
+
+    def fold(self):
+        if not self.pending:
+            return
+        v = np.maximum(np.array(self.pending, dtype=np.int64), 0)
+        self.pending.clear()
+
+        e = np.maximum(np.frexp(v.astype(np.float64))[1] - self.sub_bits, 0) # frexp exponent == bit length
+        idx = np.where(e > 0, (e << self.sub_bits) + (v >> e), v)
+        self.counts += np.bincount(idx, minlength=len(self.counts))
+        self.n += len(v)
+        self.total += int(v.sum())
+        self.max = max(self.max, int(v.max()))
+
+    # Called from the control loop, off the timed path, so pending never grows without bound
+    def maybe_fold(self):
+        if len(self.pending) >= self.fold_at:
+            self.fold()
+
+    def _bucket_value(self, idx):
+        e = idx >> self.sub_bits
+        m = idx & ((1 << self.sub_bits) - 1)
+        if e == 0:
+            return m
+        return m << e
+
+    def percentile(self, p):
+        self.fold()
+        if self.n == 0:
+            return 0
+        idx = int(np.searchsorted(np.cumsum(self.counts), p / 100 * self.n))
+        return min(self._bucket_value(min(idx, len(self.counts) - 1)), self.max)
+
+    def mean(self):
+        self.fold()
+        return self.total / self.n if self.n else 0.0
+
+    def summary(self):
+        return {
+            'count': self.n + len(self.pending),
+            'mean_ns': round(self.mean(), 1),
+            'p50_ns': self.percentile(50),
+            'p90_ns': self.percentile(90),
+            'p99_ns': self.percentile(99),
+            'p999_ns': self.percentile(99.9),
+            'max_ns': self.max,
+        }
+
+# Histograms and counters are created from whichever thread instruments an assist (e.g. the
+# build thread of strategy.HotSwap) while others iterate them, so new entries are published as a
+# new dict in one reference assignment instead of being inserted into the one being iterated.
+class Probes:
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.last_tick_ns = None
+
+    def histogram(self, name):
+        h = self.histograms.get(name)
+        if h is None:
+            h = Histogram()
+            self.histograms = {**self.histograms, name: h}
+        return h
+
+    def _counter(self, name):
+        if name not in self.counters:
+            self.counters = {**self.counters, name: 0}
+
+    def record(self, name, ns):
+        self.histogram(name).record(ns)
+
+    def count(self, name, n=1):
+        self._counter(name)
+        self.counters[name] += n
+
+    # Call once per control tick: records |actual period - intended period| as 'jitter'
+    def tick(self, now_ns, period_ns):
+        if self.last_tick_ns is not None:
+            self.histogram('jitter').record(abs(now_ns - self.last_tick_ns - period_ns))
+        self.last_tick_ns = now_ns
+
+    def maybe_fold(self):
+        for h in self.histograms.values():
+            h.maybe_fold()
+
+    # Replaces obj.method with a version that records every `every`-th call into histogram `name`
+    def time_method(self, obj, method, name=None, every=1):
+        fn = getattr(obj, method)
+        append = self.histogram(name or method).pending.append
+        clock = time.perf_counter_ns
+
+        if every == 1:
+            def timed(*args, **kwargs):
+                t0 = clock()
+                result = fn(*args, **kwargs)
+                append(clock() - t0)
+                return result
+        else:
+            skipped = 0
+
+            def timed(*args, **kwargs):
+                nonlocal skipped
+                if skipped:
+                    skipped -= 1
+                    return fn(*args, **kwargs)
+                skipped = every - 1
+                t0 = clock()
+                result = fn(*args, **kwargs)
+                append(clock() - t0)
+                return result
+
+        setattr(obj, method, timed)
+
+    # Replaces obj.method with a version that bumps counter `name`
+    def count_method(self, obj, method, name=None):
+        fn = getattr(obj, method)
+        probes = self
+        key = name or method
+        self._counter(key)
+
+        def counted(*args, **kwargs):
+            probes.counters[key] += 1
+            return fn(*args, **kwargs)
+
+        setattr(obj, method, counted)
+
+    def snapshot(self):
+        return {
+            'stages': {name: h.summary() for name, h in self.histograms.items()},
+            'counters': dict(self.counters),
+        }
+
+    def summary_lines(self):
+        lines = []
+        for name, h in self.histograms.items():
+            p50, p99 = h.percentile(50), h.percentile(99)
+            lines.append(f"{name}: p50 {p50 / 1000:.1f}us  p99 {p99 / 1000:.1f}us  max {h.max / 1000:.1f}us  n={h.n}")
+        for name, c in self.counters.items():
+            lines.append(f"{name}: {c}")
+        return lines
+
+    def reset(self):
+        for h in self.histograms.values():
+            h.reset()
+        for name in self.counters:
+            self.counters[name] = 0
+
+# Outermost per-sample method of each version: update_as_delta for v2.1, update for v1 and v2.
+# The stages inside them (get_fx_fy, mitigate_error) are not timed on their own. Every
+# Strategy.entry_point must be one of these, as bench.py reads its histogram.
+STAGES = ('update_as_delta', 'update')
+
+# Times the per-sample stage of any assist version on every `every`-th sample, and counts
+# position writes. With the default of 4 that is two wrapper calls and a quarter of a timing
+# per sample, a few hundred nanoseconds in all.
+def instrument_assist(probes, assist, every=4):
+    method = next((m for m in STAGES if hasattr(assist, m)), None)
+    if method is not None:
+        probes.time_method(assist, method, every=every)
+    if hasattr(assist, 'set_position'):
+        probes.count_method(assist, 'set_position')
+    elif getattr(assist, 'backend', None) is not None:
+        # v1 and v2 write straight to their cursor backend
+        probes.count_method(assist.backend, 'set_pos', 'set_position')
+    return assist
+
+# Appends a JSON line with the current snapshot every `interval` seconds
+class Dumper:
+    def __init__(self, probes, path, interval=5.0, reset=False):
+        self.probes = probes
+        self.path = path
+        self.interval_ns = int(interval * 1e9)
+        self.reset = reset
+        self.next_ns = time.perf_counter_ns() + self.interval_ns
+
+    def maybe_dump(self, now_ns):
+        if now_ns < self.next_ns:
+            return
+        self.next_ns = now_ns + self.interval_ns
+        self.dump()
+
+    def dump(self):
+        entry = self.probes.snapshot()
+        entry['time'] = time.time()
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        if self.reset:
+            self.probes.reset()
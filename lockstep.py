@@ -0,0 +1,297 @@
+# Lockstep simulation of many sessions at once
+#
+# sim.simulate() replays one session through the assist's per-sample Python methods. Here N
+# independent sessions advance together as a struct of arrays: every session has its own
+# cursor, target, debt and parameter set, and one sample tick is a handful of NumPy operations
+# over all of them, so tuning and evaluation scale with the number of sessions per call
+# instead of with interpreter overhead.
+#
+#   result = simulate_many(trace, 'v2p1', params=[{'k': 0.4}, {'k': 0.6}, ...])
+#   result.hit_times()[i], result.overshoots()[i]     # session i, as sim.SimResult
+#
+# Each session reproduces sim.simulate() of its parameters with an integer cursor. The two
+# versions take them differently: a v2p1 session with params p is sim.simulate(trace, 'v2p1',
+# params=p), while a v2 session takes v2.compile_constants arguments, which sim.simulate() only
+# accepts as a profile: sim.simulate(trace, 'v2', profile=...) with v2 = compile_constants(**p).
+# Only v2 and v2p1 without prediction or raster lookups have a lockstep form; traces carry no
+# slider frames, so the slider path of v2p1 never runs here either.
+
+import numpy as np
+
+from sim import HIT_RADIUS, Trace
+
+# One MonotoneCubic per session, evaluated for a subset of sessions at a time
+class _CubicLanes:
+    def __init__(self, cubics):
+        tables = [c.table() for c in cubics]
+        knots = np.array([t[0] for t in tables], dtype=float)
+        self.a, self.b = knots[:, 0], knots[:, 1]
+        self.coeffs = np.array([t[1] for t in tables])
+        self.total = np.array([t[2] for t in tables])
+        self.reversed = np.array([c.reversed for c in cubics])
+        self.s = np.array([c.s for c in cubics], dtype=float)
+
+    # F_as_ratio(x) of the cubics of `rows`
+    def ratio(self, x, rows):
+        x = np.where(self.reversed[rows], self.s[rows] - x, x)
+        segment = (x >= self.a[rows]).astype(int) + (x >= self.b[rows])
+        x0, c0, c1, c2, c3 = self.coeffs[rows, segment].T
+        t = x - x0
+        return (c0 + t * (c1 + t * (c2 + t * c3))) / self.total[rows]
+
+# v2.AimAssist.update, one lane per session
+class _V2Lanes:
+    def __init__(self, params):
+        import v2
+
+        constants = [v2.compile_constants(**p) for p in params]
+        for name in v2.Constants._fields:
+            setattr(self, name, np.array([getattr(c, name) for c in constants], dtype=float))
+        n = len(params)
+        self.target = np.zeros((n, 2))
+        self.has_target = np.zeros(n, dtype=bool)
+
+    def spawn(self, rows, targets, now, cursor):
+        self.target[rows] = targets
+        self.has_target[rows] = True
+
+    def step(self, rows, cursor, now, deltas):
+        rows = rows[self.has_target[rows]]
+        p = cursor[rows]
+        o = p - self.target[rows]
+        d2 = o[:, 0] * o[:, 0] + o[:, 1] * o[:, 1]
+
+        # force_field * alpha_function, in the same operation order as get_fx_fy
+        U0, inv_sigma2, inv_two_sigma2 = self.U0[rows], self.inv_sigma2[rows], self.inv_two_sigma2[rows]
+        w = (-U0 * inv_sigma2 * np.exp(-d2 * inv_two_sigma2)
+             * (1 - (np.sqrt(d2) * self.inv_R[rows])**self.n[rows]) * self.strength[rows])
+        F = o * np.where(d2 > self.R2[rows], 0.0, w)[:, None]
+        F = np.where(np.abs(F) < 1, F * self.f_mitigation[rows][:, None], F)
+        return rows, p + F
+
+# AimAssistV2p1.update_as_delta with its DebtAccount, one lane per session
+class _V2p1Lanes:
+    IDLE, RAMPING, CONSTANT = 0, 1, 2
+
+    def __init__(self, params):
+        import v2p1
+
+        constants = [v2p1.compile_constants(v2p1.merge_params(p)) for p in params]
+        for name in ('V2', 'inv_two_sigma2', 'k', 'debt_paying_speed', 'time_limit', 'distance_limit'):
+            setattr(self, name, np.array([getattr(c, name) for c in constants], dtype=float))
+        self.distance_cubic = _CubicLanes([c.distance_cubic for c in constants])
+        self.time_cubic = _CubicLanes([c.time_cubic for c in constants])
+
+        n = len(params)
+        self.real = np.zeros((n, 2))
+        self.last = np.zeros((n, 2))
+        self.target = np.zeros((n, 2))
+        self.has_target = np.zeros(n, dtype=bool)
+        self.target_time = np.full(n, np.nan)
+        self.last_target = np.zeros((n, 2))
+        self.has_last_target = np.zeros(n, dtype=bool)
+        # DebtAccount
+        self.debt = np.zeros((n, 2))
+        self.state = np.full(n, self.IDLE)
+        self.start_time = np.zeros(n)
+        self.base_ratio = np.zeros(n)
+        self.payment = np.zeros((n, 2))
+
+    # V2p1Strategy.set_target followed by set_target_position
+    def spawn(self, rows, targets, now, cursor):
+        # The first target picks up wherever the cursor went (reset())
+        first = rows[~self.has_target[rows]]
+        self.real[first] = cursor[first]
+        self.last[first] = cursor[first]
+
+        repeat = ((self.has_target[rows] & np.all(self.target[rows] == targets, axis=1))
+                  | (self.target_time[rows] == now))
+        rows, targets = rows[~repeat], targets[~repeat]
+
+        self.last_target[rows] = self.target[rows]
+        self.has_last_target[rows] = self.has_target[rows]
+        self.target[rows] = targets
+        self.has_target[rows] = True
+        self.target_time[rows] = now
+
+        # DebtAccount.on_target
+        debt = self.real[rows] - self.last[rows]
+        self.debt[rows] = debt
+        self.start_time[rows] = now
+        idle = ~self.has_last_target[rows] | (np.sqrt(debt[:, 0]**2 + debt[:, 1]**2) < 1)
+        self.state[rows[idle]] = self.IDLE
+        self.payment[rows[idle]] = 0.0
+
+        ramp = rows[~idle]
+        d = self.target[ramp] - self.last_target[ramp]
+        distance = np.minimum(np.sqrt(d[:, 0]**2 + d[:, 1]**2), self.distance_limit[ramp])
+        self.base_ratio[ramp] = self.distance_cubic.ratio(distance / self.distance_limit[ramp] * 500, ramp)
+        self.state[ramp] = self.RAMPING
+
+    # DebtAccount.pay
+    def _pay(self, rows, now):
+        payment = self.payment[rows]
+        ramping = self.state[rows] == self.RAMPING
+        ramp = rows[ramping]
+        if not len(ramp):
+            return payment
+
+        uptime = now - self.start_time[ramp]
+        expired = uptime >= self.time_limit[ramp]
+        x = np.where(expired, 500, uptime / self.time_limit[ramp] * 500)
+        ratio = self.base_ratio[ramp] * self.time_cubic.ratio(x, ramp) * self.debt_paying_speed[ramp]
+        pay = ratio[:, None] * self.debt[ramp]
+
+        settled = ramp[expired]
+        self.state[settled] = self.CONSTANT
+        self.payment[settled] = pay[expired]
+        payment[ramping] = pay
+        return payment
+
+    def step(self, rows, cursor, now, deltas):
+        active = self.has_target[rows]
+        rows, deltas = rows[active], deltas[active]
+        real = self.real[rows] + deltas
+        self.real[rows] = real
+
+        # _filter
+        o = real - self.target[rows]
+        d2 = o[:, 0] * o[:, 0] + o[:, 1] * o[:, 1]
+        w = np.where(d2 > self.V2[rows], 0.0, -self.k[rows] * np.exp(-d2 * self.inv_two_sigma2[rows]))
+        c = real + o * w[:, None]
+
+        position = c + self._pay(rows, now)
+        self.last[rows] = position
+        return rows, position
+
+LANES = {'v2': _V2Lanes, 'v2p1': _V2p1Lanes}
+
+class BatchResult:
+    def __init__(self, version, hit_samples, overshoots, counts, rate, positions=None):
+        self.version = version
+        self.hit_samples = hit_samples # (N, K) samples from spawn to first hit, -1 if never hit
+        self.overshoot_px = overshoots # (N, K)
+        self.counts = counts # (N,) targets per session; columns past a session's count are padding
+        self.rate = rate
+        self.positions = positions # (T, N, 2) cursor after each sample, if recorded
+
+    def __len__(self):
+        return len(self.counts)
+
+    # Per session, as SimResult.hit_times() / overshoots()
+    def hit_times(self):
+        hit = np.where(self.hit_samples >= 0, (self.hit_samples + 1) / self.rate, np.nan)
+        return [row[:n] for row, n in zip(hit, self.counts)]
+
+    def overshoots(self):
+        return [row[:n] for row, n in zip(self.overshoot_px, self.counts)]
+
+# traces: one sim.Trace for every session, or one per session
+# params: one parameter dict per session (as the version's simulate() kwargs: AimAssistV2p1
+# params, or v2.compile_constants arguments), or None for the defaults
+# record: also keep every session's cursor path (T * N * 2 floats)
+def simulate_many(traces, version='v2p1', params=None, hit_radius=HIT_RADIUS, record=False):
+    if version not in LANES:
+        raise ValueError(f"Unknown lockstep version: {version}")
+    traces = [traces] if isinstance(traces, Trace) else list(traces)
+    params = [{}] if params is None else list(params)
+    n = max(len(traces), len(params))
+    if len(traces) not in (1, n) or len(params) not in (1, n):
+        raise ValueError("traces and params must be of the same length, or of length 1")
+    if len({t.rate for t in traces}) != 1:
+        raise ValueError("All traces must have the same sample rate")
+
+    lanes = LANES[version](params * n if len(params) == 1 else params)
+    shared = len(traces) == 1
+    steps = max(len(t) for t in traces)
+    lengths = np.array([len(t) for t in traces] * (n if shared else 1))
+    cursor = np.array([t.start for t in traces] * (n if shared else 1), dtype=float)
+    if shared:
+        deltas = traces[0].deltas
+    else:
+        deltas = np.zeros((steps, n, 2), dtype=traces[0].deltas.dtype)
+        for s, t in enumerate(traces):
+            deltas[:len(t), s] = t.deltas
+
+    # Spawn events sorted by sample, then by their order within a sample of the same session
+    events = []
+    for s, t in enumerate(traces):
+        sessions = np.arange(n) if shared else np.array([s])
+        rank, last = 0, None
+        for k, (i, x, y) in enumerate(t.spawns):
+            rank = rank + 1 if i == last else 0
+            last = i
+            events.extend((i, rank, session, k, x, y) for session in sessions)
+    events = np.array(events, dtype=float).reshape(-1, 6)
+    events = events[np.lexsort((events[:, 1], events[:, 0]))]
+    ticks = events[:, 0].astype(int)
+
+    counts = np.zeros(n, dtype=int)
+    np.add.at(counts, events[:, 2].astype(int), 1)
+    hit_samples = np.full((n, max(counts.max(initial=0), 1)), -1)
+    overshoots = np.zeros(hit_samples.shape)
+
+    # Scoring of each session's current target, as sim._score_targets
+    segment = np.full(n, -1)
+    spawned_at = np.zeros(n, dtype=int)
+    scored = np.zeros((n, 2))
+    approach = np.zeros((n, 2))
+    hit = np.full(n, -1)
+    overshoot = np.zeros(n)
+
+    everyone = np.arange(n)
+    positions = np.empty((steps, n, 2)) if record else None
+    dt = 1.0 / traces[0].rate
+    now = 0.0
+    e = 0
+    for i in range(steps):
+        now += dt # accumulated like sim.VirtualClock, so timestamps match bit for bit
+        while e < len(events) and ticks[e] == i:
+            group = events[e:e + np.searchsorted(ticks[e:], i, side='right')]
+            for rank in np.unique(group[:, 1]):
+                spawn = group[group[:, 1] == rank]
+                rows = spawn[:, 2].astype(int)
+                targets = spawn[:, 4:6]
+
+                done = rows[segment[rows] >= 0]
+                hit_samples[done, segment[done]] = hit[done]
+                overshoots[done, segment[done]] = overshoot[done]
+                segment[rows] = spawn[:, 3].astype(int)
+                spawned_at[rows] = i
+                scored[rows] = targets
+                a = targets - cursor[rows]
+                norm = np.hypot(a[:, 0], a[:, 1])
+                approach[rows] = np.where(norm[:, None] > 0, a / np.where(norm > 0, norm, 1)[:, None], 0.0)
+                hit[rows] = -1
+                overshoot[rows] = 0.0
+
+                lanes.spawn(rows, targets, now, cursor)
+            e += len(group)
+
+        d = deltas[i]
+        if shared:
+            moved = everyone if d[0] != 0 or d[1] != 0 else everyone[:0]
+            cursor[moved] += d
+            rel = np.broadcast_to(d, (len(moved), 2))
+        else:
+            moved = np.flatnonzero((d[:, 0] != 0) | (d[:, 1] != 0))
+            cursor[moved] += d[moved]
+            rel = d[moved]
+
+        if len(moved):
+            rows, position = lanes.step(moved, cursor, now, rel)
+            cursor[rows] = np.trunc(position) # VirtualMouse(integer=True).set_pos
+
+        if record:
+            positions[i] = cursor
+
+        live = np.flatnonzero((segment >= 0) & (i < lengths))
+        offset = cursor[live] - scored[live]
+        inside = live[(np.hypot(offset[:, 0], offset[:, 1]) <= hit_radius) & (hit[live] < 0)]
+        hit[inside] = i - spawned_at[inside]
+        overshoot[live] = np.maximum(overshoot[live], np.einsum('ij,ij->i', offset, approach[live]))
+
+    done = np.flatnonzero(segment >= 0)
+    hit_samples[done, segment[done]] = hit[done]
+    overshoots[done, segment[done]] = overshoot[done]
+    return BatchResult(version, hit_samples, overshoots, counts, traces[0].rate, positions)
@@ -0,0 +1,42 @@
+# Sub-pixel output stage
+#
+# pygame.mouse.set_pos and OS cursor APIs only take whole pixels, so fractional corrections
+# used to be truncated away (hence v1's PYGAME_MITIGATION and v2's f_mitigation). This
+# wrapper keeps the fractional part as a residual: reads return the integer cursor plus the
+# residual, writes round to the nearest pixel and carry the remainder to the next sample.
+# Small corrections therefore add up exactly, at any loop rate.
+
+from backend import CursorBackend
+
+class SubpixelMouse(CursorBackend):
+    # mouse: any cursor backend (see backend.py)
+    def __init__(self, mouse):
+        self.mouse = mouse
+        self.rx = 0.0
+        self.ry = 0.0
+
+    def get_pos(self):
+        x, y = self.mouse.get_pos()
+        return x + self.rx, y + self.ry
+
+    def set_pos(self, x, y=None):
+        if y is None:
+            x, y = x
+        ix, iy = round(x), round(y)
+        self.rx, self.ry = x - ix, y - iy
+        # Only whole-pixel moves reach the cursor
+        if (ix, iy) != tuple(self.mouse.get_pos()):
+            self.mouse.set_pos(ix, iy)
+
+    def get_rel(self):
+        return self.mouse.get_rel()
+
+    def flush(self):
+        self.mouse.flush()
+
+    def reset(self):
+        self.rx = self.ry = 0.0
+
+    # get_rel and anything else go straight to the wrapped mouse
+    def __getattr__(self, name):
+        return getattr(self.mouse, name)
@@ -0,0 +1,341 @@
+# Multi-process assist pipeline
+#
+# The assist runs in its own process, so a slow frame or a GC pause in the trainer does not
+# delay corrections, and the two sides can be pinned to different cores. They talk through
+# two single-producer single-consumer rings in multiprocessing.shared_memory:
+#   inputs   trainer -> assist   raw samples, targets and version switches, each with the cursor position
+#   outputs  assist -> trainer   the correction of every sample, as an offset to add to the cursor
+# Records are fixed-width rows of a NumPy structured array living in the shared block, so
+# nothing is pickled or queued per sample. Every record carries its sequence number; readers
+# count the numbers they never saw (overrun by the writer) as dropped.
+#
+# SDL only delivers input and draws in the process that owns the window, so input sampling and
+# rendering both stay in the trainer (python play.py --pipeline); only the assist moves out.
+# Corrections arrive one control tick or more after their sample and are applied as offsets,
+# so motion that happened in between is kept.
+#
+# The position the trainer reports lacks the corrections still in flight, so the assist keeps
+# its own cursor: the position it last set plus the raw motion since. Every record says whether
+# any sample was in flight when it was written; when none was, the trainer's position is
+# complete and the assist's cursor is reset to it, which also drops drift from clamping and
+# integer set_pos on the trainer side. The assist's clock is the time each record was written,
+# so its timing does not depend on how far behind it runs.
+#
+# The assist process is started as `python pipeline.py <rings>` rather than through
+# multiprocessing, whose spawn method would re-run the trainer's top-level code in the child.
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backend import CursorBackend
+
+# Kinds of input records; x, y is always the cursor position, and `synced` is 1 when the
+# correction of every sample before had arrived
+SAMPLE = 0 # a, b: raw delta
+TARGET = 1 # a, b: current target, c, d: next target (NaN if none)
+SWITCH = 2 # a: index of the version in NAMES
+
+INPUT_DTYPE = np.dtype([('seq', '<i8'), ('t', '<i8'), ('kind', 'u1'), ('synced', 'u1'),
+                        ('a', '<f8'), ('b', '<f8'), ('c', '<f8'), ('d', '<f8'), ('x', '<f8'), ('y', '<f8')])
+OUTPUT_DTYPE = np.dtype([('seq', '<i8'), ('t', '<i8'), ('sample', '<i8'), ('x', '<f8'), ('y', '<f8')])
+
+NAMES = ('v1', 'v2', 'v2p1')
+
+# Header: the number of records ever written, the number the reader missed, and a stop flag
+_HEADER = np.dtype([('head', '<i8'), ('dropped', '<i8'), ('stop', '<i8')])
+
+class Ring:
+    # spec: (name, dtype, capacity) of an existing ring to attach to, from another ring's .spec
+    def __init__(self, dtype=INPUT_DTYPE, capacity=4096, spec=None):
+        if spec is not None:
+            name, dtype, capacity = spec
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        else:
+            self.shm = shared_memory.SharedMemory(create=True, size=_HEADER.itemsize + capacity * dtype.itemsize)
+            self.owner = True
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self.header = np.ndarray((), _HEADER, self.shm.buf)
+        self.records = np.ndarray(capacity, self.dtype, self.shm.buf, offset=_HEADER.itemsize)
+        self.seqs = self.records['seq']
+        if self.owner:
+            self.header['head'] = 0
+            self.header['dropped'] = 0
+            self.header['stop'] = 0
+            self.seqs[:] = -1
+        self.head = int(self.header['head']) # next sequence number to write
+        self.seq = 0 # next sequence number to read; a reader that attaches late still sees what is left
+
+    @property
+    def spec(self):
+        return self.shm.name, self.dtype, self.capacity
+
+    # Writer side. The slot is marked invalid while it is rewritten, so a reader that is
+    # overrun in the middle of copying it sees a sequence mismatch instead of a torn record.
+    def put(self, *fields):
+        seq = self.head
+        i = seq % self.capacity
+        self.records[i] = (-1, *fields)
+        self.seqs[i] = seq
+        self.head = seq + 1
+        self.header['head'] = self.head
+
+    # Reader side: every record published since the last call, as tuples
+    def take(self):
+        head = int(self.header['head'])
+        dropped = 0
+        if head - self.seq > self.capacity:
+            dropped = head - self.capacity - self.seq
+            self.seq = head - self.capacity
+        records = []
+        while self.seq < head:
+            i = self.seq % self.capacity
+            record = self.records[i].item()
+            if record[0] == self.seq and self.seqs[i] == self.seq:
+                records.append(record)
+            else:
+                dropped += 1
+            self.seq += 1
+        if dropped:
+            self.header['dropped'] += dropped
+        return records
+
+    # Records the reader never saw, as seen from either side
+    @property
+    def dropped(self):
+        return int(self.header['dropped'])
+
+    def stop(self):
+        self.header['stop'] = 1
+
+    @property
+    def stopped(self):
+        return bool(self.header['stop'])
+
+    def close(self):
+        # The views must go before the block can be closed
+        del self.header, self.records, self.seqs
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+# Cursor backend of the assist process: reads come from the sample being replayed, and the
+# position the assist sets goes back to the trainer as an offset from where the sample's raw
+# motion alone would have left the cursor
+class RingBackend(CursorBackend):
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.sample = -1
+        self.t = 0
+        self.rel = 0, 0
+        self.base = self.pos = 0.0, 0.0
+        self.fed = False
+
+    # x, y: the trainer's position, taken over when nothing was in flight (`synced`)
+    def feed(self, seq, t, dx, dy, x, y, synced):
+        self.sample, self.t = seq, t
+        self.rel = dx, dy
+        if synced or not self.fed:
+            self.fed = True
+            self.pos = x, y
+        else:
+            self.pos = self.pos[0] + dx, self.pos[1] + dy
+        self.base = self.pos
+
+    def get_rel(self):
+        rel = self.rel
+        self.rel = 0, 0
+        return rel
+
+    def get_pos(self):
+        return self.pos
+
+    def set_pos(self, x, y=None):
+        if y is None:
+            x, y = x
+        self.pos = x, y
+
+    # One output per sample, moved or not, so that the trainer can count what is in flight
+    def flush(self):
+        self.outputs.put(self.t, self.sample, self.pos[0] - self.base[0], self.pos[1] - self.base[1])
+        self.base = self.pos
+
+def pin(cpu):
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+
+# Only the creator may unlink a block, but before Python 3.13 (SharedMemory(track=False)) every
+# process that attaches registers it with its own resource tracker, which unlinks it on exit
+def _untrack(ring):
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister(ring.shm._name, 'shared_memory')
+
+# Assist side of the rings: replays every input record through a strategy.HotSwap and writes
+# the corrections. options and the profile are as for HotSwap.
+class AssistServer:
+    def __init__(self, inputs, outputs, version, options=None, profile=None):
+        from strategy import HotSwap
+
+        self.inputs = inputs
+        self.backend = RingBackend(outputs)
+        self.assist = HotSwap(version, self.backend, self.clock, options=options, profile=profile)
+
+    def clock(self):
+        return self.backend.t * 1e-9
+
+    # Handles whatever records arrived; returns how many
+    def poll(self):
+        records = self.inputs.take()
+        backend, assist = self.backend, self.assist
+        for seq, t, kind, synced, a, b, c, d, x, y in records:
+            if kind == SAMPLE:
+                backend.feed(seq, t, a, b, x, y, synced)
+                assist.step(self.clock())
+                backend.flush()
+            elif kind == TARGET:
+                backend.feed(seq, t, 0, 0, x, y, synced)
+                assist.set_target(None if math.isnan(a) else (a, b), None if math.isnan(c) else (c, d), self.clock())
+            elif kind == SWITCH:
+                assist.request(NAMES[int(a)])
+        return len(records)
+
+# Body of the assist process; with a profile the process watches the profile file itself and
+# reloads it live
+def run_assist(input_spec, output_spec, version, options=None, profiles_path=None, profile=None, cpu=None,
+               idle_sleep=0.0002):
+    pin(cpu)
+    inputs = Ring(spec=input_spec)
+    outputs = Ring(spec=output_spec)
+    _untrack(inputs)
+    _untrack(outputs)
+    watcher = None
+    if profile:
+        from profiles import ProfileWatcher
+        watcher = ProfileWatcher(profiles_path or 'profiles.json', profile)
+    server = AssistServer(inputs, outputs, version, options, watcher.profile if watcher else None)
+    if watcher:
+        watcher.on_change = server.assist.set_profile
+        watcher.start()
+
+    try:
+        while not inputs.stopped:
+            if not server.poll():
+                time.sleep(idle_sleep)
+    finally:
+        if watcher:
+            watcher.stop()
+        inputs.close()
+        outputs.close()
+
+# Trainer side: owns both rings and the assist process, and stands in for a strategy.HotSwap
+# driving `backend` (set_target, step, request). `now`, where given, is in seconds on the
+# time.perf_counter clock.
+class Pipeline:
+    def __init__(self, version, backend, options=None, profiles_path=None, profile=None, capacity=4096, cpu=None):
+        if version not in NAMES:
+            raise ValueError(f"Unknown strategy: {version}")
+        self.name = version
+        self.backend = backend
+        self.inputs = Ring(INPUT_DTYPE, capacity)
+        self.outputs = Ring(OUTPUT_DTYPE, capacity)
+        self.command = [sys.executable, os.path.abspath(__file__), self.inputs.shm.name, self.outputs.shm.name,
+                        str(capacity), version, '--options', json.dumps(options or {})]
+        if profile:
+            self.command += ['--profile', profile, '--profiles', profiles_path or 'profiles.json']
+        if cpu is not None:
+            self.command += ['--cpu', str(cpu)]
+        self.process = None
+        # Sequence numbers of the last sample sent and of the last one whose correction came back;
+        # by number, so that dropped records do not leave a sample in flight forever
+        self.last_sample = self.acked = -1
+        self.corrections = 0
+        self.latency_ns = 0 # of the last correction, from its sample being written
+
+    def start(self):
+        self.process = subprocess.Popen(self.command)
+        return self
+
+    def stop(self):
+        self.inputs.stop()
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.process.terminate()
+        self.inputs.close()
+        self.outputs.close()
+
+    def _put(self, kind, a=0.0, b=0.0, c=0.0, d=0.0, now=None):
+        x, y = self.backend.get_pos()
+        t = time.perf_counter_ns() if now is None else round(now * 1e9)
+        self.inputs.put(t, kind, self.acked >= self.last_sample, a, b, c, d, x, y)
+
+    def set_target(self, target, next_target=None, now=None):
+        self._apply(self.correction())
+        a, b = target if target is not None else (math.nan, math.nan)
+        c, d = next_target if next_target is not None else (math.nan, math.nan)
+        self._put(TARGET, a, b, c, d, now=now)
+
+    def request(self, name):
+        if name not in NAMES:
+            raise ValueError(f"Unknown strategy: {name}")
+        self.name = name
+        self._put(SWITCH, NAMES.index(name))
+
+    # Applies whatever corrections came back, then sends this tick's motion to the assist process
+    def step(self, now=None):
+        rel = self.backend.get_rel()
+        self._apply(self.correction())
+        if rel[0] != 0 or rel[1] != 0:
+            self._put(SAMPLE, *rel, now=now)
+            self.last_sample = self.inputs.head - 1
+        return rel
+
+    def _apply(self, correction):
+        cx, cy = correction
+        if cx or cy:
+            x, y = self.backend.get_pos()
+            self.backend.set_pos(x + cx, y + cy)
+
+    # Sum of the corrections that arrived since the last call, to add to the cursor
+    def correction(self):
+        cx = cy = 0.0
+        records = self.outputs.take()
+        for seq, t, sample, x, y in records:
+            if x or y:
+                cx += x
+                cy += y
+                self.corrections += 1
+                self.latency_ns = time.perf_counter_ns() - t
+        if records:
+            self.acked = records[-1][2]
+        return cx, cy
+
+    def summary_lines(self):
+        return [f"pipeline: {self.inputs.head} samples in, {self.corrections} corrections, "
+                f"last after {self.latency_ns / 1e3:.0f} us",
+                f"dropped: {self.inputs.dropped} in, {self.outputs.dropped} out"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Assist process of the pipeline (started by Pipeline)')
+    parser.add_argument('inputs', help='shared memory name of the input ring')
+    parser.add_argument('outputs', help='shared memory name of the output ring')
+    parser.add_argument('capacity', type=int)
+    parser.add_argument('version', choices=NAMES)
+    parser.add_argument('--options', default='{}', help='JSON constructor kwargs per version')
+    parser.add_argument('--profile')
+    parser.add_argument('--profiles')
+    parser.add_argument('--cpu', type=int)
+    args = parser.parse_args()
+
+    run_assist((args.inputs, INPUT_DTYPE, args.capacity), (args.outputs, OUTPUT_DTYPE, args.capacity), args.version,
+               json.loads(args.options), args.profiles, args.profile, args.cpu)
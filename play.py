@@ -1,9 +1,19 @@
 import pygame
 import random
+import sys
+import threading
 import time
-import numpy as np
 from collections import deque
-from v2 import AimAssist
+from strategy import HotSwap
+from record import Recorder
+from control import AdaptiveLoop, LatestSlot
+from instrument import Probes, Dumper, instrument_assist
+from field import TargetField
+from output import SubpixelMouse
+from backend import BatchedBackend, PygameBackend
+from profiles import ProfileWatcher
+from pipeline import Pipeline
+import debuglog
 pygame.init()
 
 # Constants
@@ -16,24 +26,104 @@ CIRCLE_RADIUS = 40
 NUM_CIRCLES = 4
 CROSSHAIR_SIZE = 20
 MARGIN = 30
+CONTROL_RATE = 2000 # input/assist ticks per second
+FRAME_RATE = 144
+
+# Value following `flag` on the command line, if any
+def _arg(flag):
+    if flag not in sys.argv:
+        return None
+    i = sys.argv.index(flag) + 1
+    return sys.argv[i] if i < len(sys.argv) and not sys.argv[i].startswith('--') else None
+
+# python play.py --record session.aarec
+RECORD_PATH = _arg('--record')
+# python play.py --stats [stats.jsonl]: on-screen latency overlay, optionally dumped to a file every 5 s
+STATS = '--stats' in sys.argv
+STATS_PATH = _arg('--stats')
+# python play.py --multi: every queued circle pulls, later ones more weakly
+MULTI = '--multi' in sys.argv
+# python play.py --assist v2p1: starting version; keys 1, 2, 3 switch between versions while playing
+ASSIST = _arg('--assist') or 'v2'
+SWITCH_KEYS = {pygame.K_1: 'v1', pygame.K_2: 'v2', pygame.K_3: 'v2p1'}
+# python play.py --profile sticky [--profiles profiles.json]: constants from a named profile.
+# Assist constants reload live when the file is saved; the layout is read at startup only.
+PROFILE = _arg('--profile')
+# python play.py --pipeline [CPU]: the assist runs in its own process, optionally pinned to a core (see pipeline.py)
+PIPELINE = '--pipeline' in sys.argv
+PIPELINE_CPU = _arg('--pipeline')
+profile_watcher = ProfileWatcher(_arg('--profiles') or 'profiles.json', PROFILE) if PROFILE else None
+if profile_watcher:
+    layout = profile_watcher.profile.trainer
+    SCREEN_WIDTH, SCREEN_HEIGHT = layout.screen_width, layout.screen_height
+    CIRCLE_RADIUS, MARGIN, NUM_CIRCLES = layout.circle_radius, layout.margin, layout.num_circles
 
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption("Aim Trainer")
-clock = pygame.time.Clock()
 
 # Initialize font
 font = pygame.font.Font(None, 36)
+stats_font = pygame.font.Font(None, 20)
 
 # Hide the default cursor
 pygame.mouse.set_visible(False)
 
+# Rendering keeps no per-frame allocations: circle sprites are rendered once per alpha level,
+# guide lines go onto one reusable overlay, and every draw returns the rect it touched so
+# only dirty rectangles are cleared and pushed to the display.
+_circle_sprites = {}
+_line_overlay = None
+_line_rect = None
+
+def circle_sprite(alpha):
+    sprite = _circle_sprites.get(alpha)
+    if sprite is None:
+        sprite = pygame.Surface((CIRCLE_RADIUS * 2, CIRCLE_RADIUS * 2), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, (*YELLOW, alpha), (CIRCLE_RADIUS, CIRCLE_RADIUS), CIRCLE_RADIUS)
+        _circle_sprites[alpha] = sprite
+    return sprite
+
+def draw_overlay_line(surface, color, start, end, width):
+    global _line_overlay, _line_rect
+    if _line_overlay is None:
+        _line_overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+    if _line_rect is not None:
+        _line_overlay.fill((0, 0, 0, 0), _line_rect)
+    _line_rect = pygame.draw.line(_line_overlay, color, start, end, width)
+    return surface.blit(_line_overlay, _line_rect.topleft, _line_rect)
+
+_text_cache = (None, None)
+
+def render_time_text(time_taken):
+    global _text_cache
+    if _text_cache[0] != time_taken:
+        _text_cache = (time_taken, font.render(f"Time to click: {time_taken:.3f}s", True, WHITE))
+    return _text_cache[1]
+
+_stats_lines = []
+_stats_next = 0.0
+
+# Refreshed twice a second, so the overlay costs nothing on most frames
+def render_stats():
+    global _stats_lines, _stats_next
+    if time.perf_counter() >= _stats_next:
+        _stats_next = time.perf_counter() + 0.5
+        if PIPELINE:
+            lines = [f"assist {aim_assist.name}"] + aim_assist.summary_lines() + probes.summary_lines()
+        else:
+            lines = [f"assist {aim_assist.name} ({aim_assist.swaps} swaps)"] + probes.summary_lines()
+        if profile_watcher and not PIPELINE:
+            error = f", reload failed: {profile_watcher.error}" if profile_watcher.error else ""
+            lines.insert(1, f"profile {profile_watcher.name} ({profile_watcher.reloads} reloads{error})")
+        _stats_lines = [stats_font.render(line, True, WHITE) for line in lines]
+    return _stats_lines
+
 class Crosshair:
     def __init__(self):
         self.size = CROSSHAIR_SIZE
     
-    def draw(self, surface):
-        x, y = pygame.mouse.get_pos()
-        pygame.draw.circle(surface, GREEN, (x, y), 10)
+    def draw(self, surface, pos):
+        return pygame.draw.circle(surface, GREEN, pos, 10)
 
 class Circle:
     def __init__(self):
@@ -49,9 +139,7 @@ class Circle:
     def draw(self, surface, order):
         if self.active:
             alpha = 255 >> order
-            circle_surface = pygame.Surface((CIRCLE_RADIUS * 2, CIRCLE_RADIUS * 2), pygame.SRCALPHA)
-            pygame.draw.circle(circle_surface, (*YELLOW, alpha), (CIRCLE_RADIUS, CIRCLE_RADIUS), CIRCLE_RADIUS)
-            surface.blit(circle_surface, (self.x - CIRCLE_RADIUS, self.y - CIRCLE_RADIUS))
+            return surface.blit(circle_sprite(alpha), (self.x - CIRCLE_RADIUS, self.y - CIRCLE_RADIUS))
     
     def check_click(self, pos):
         if not self.active:
@@ -62,11 +150,9 @@ class Circle:
     def draw_line_to_next(self, surface, next_circle, order):
         if self.active and next_circle.active:
             alpha = 255 >> order
-            line_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            pygame.draw.line(line_surface, (*YELLOW, alpha), 
-                           (self.x, self.y), 
-                           (next_circle.x, next_circle.y), 2)
-            surface.blit(line_surface, (0, 0))
+            return draw_overlay_line(surface, (*YELLOW, alpha), 
+                                     (self.x, self.y), 
+                                     (next_circle.x, next_circle.y), 2)
 
 # Initialize circles queue
 circles = deque([Circle() for _ in range(NUM_CIRCLES)])
@@ -74,28 +160,95 @@ crosshair = Crosshair()
 last_click_time = time.time()
 time_taken = 0
 
-# Game loop
-running = True
-aim_assist = AimAssist(1.0)
-while running:
-    screen.fill((0, 0, 0))
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        
+# Fractional corrections are carried by the sub-pixel output stage, so no force inflation.
+# Writes are batched and reach SDL at most once per control tick.
+mouse = SubpixelMouse(BatchedBackend(PygameBackend()))
+probes = Probes() if STATS else None
+dumper = Dumper(probes, STATS_PATH) if STATS_PATH else None
+ASSIST_OPTIONS = {'v1': {'mitigation': 1.0}, 'v2': {'f_mitigation': 1.0}}
+if PIPELINE:
+    # The assist process watches the profile file itself
+    aim_assist = Pipeline(ASSIST, mouse, ASSIST_OPTIONS, _arg('--profiles'), PROFILE,
+                          cpu=int(PIPELINE_CPU) if PIPELINE_CPU else None).start()
+else:
+    aim_assist = HotSwap(ASSIST, mouse, options=ASSIST_OPTIONS,
+                         on_build=(lambda s: instrument_assist(probes, s.assist)) if probes else None,
+                         profile=profile_watcher.profile if profile_watcher else None)
+    if profile_watcher:
+        profile_watcher.on_change = aim_assist.set_profile
+        profile_watcher.start()
+# v1 has no field constants, and the pipeline's assist is in another process, so the
+# multi-target field falls back to the v2.1 defaults there
+field = None
+if MULTI:
+    field = TargetField.from_assist(aim_assist.assist) if ASSIST != 'v1' and not PIPELINE else TargetField()
+
+def retarget():
+    aim_assist.set_target((circles[0].x, circles[0].y) if circles else None,
+                          (circles[1].x, circles[1].y) if len(circles) > 1 else None)
+
+def refresh_field():
+    field.clear()
+    for i, circle in enumerate(circles):
+        field.add(circle.x, circle.y, weight=1.0 / 2**i, priority=-i)
+
+retarget()
+if field:
+    refresh_field()
+recorder = Recorder(RECORD_PATH) if RECORD_PATH else None
+if recorder:
+    recorder.spawn(circles[0].x, circles[0].y)
+
+# The control loop publishes (cursor position, circles, time taken) here whenever it changes;
+# circles are never mutated after creation, so a tuple of them is a safe snapshot for the renderer.
+state = LatestSlot((pygame.mouse.get_pos(), tuple(circles), time_taken))
+
+# SDL video and event handling must stay on the main thread (macOS enforces it), so the main
+# thread pumps events and draws, and the input/assist loop runs on a worker thread at a fixed
+# rate while there is input. The main thread hands it clicks and keys through `commands` and
+# flags motion; SDL keeps accumulating the motion itself for get_rel(). The worker wakes the
+# main thread with a REDRAW event when the snapshot changes.
+REDRAW = pygame.event.custom_type()
+commands = deque() # MOUSEBUTTONDOWN and KEYDOWN events, appended by the main thread only
+motion = threading.Event() # MOUSEMOTION seen since the last control tick
+wake = threading.Event() # any input, ends an idle wait of the control loop
+redraw_posted = threading.Event()
+
+def control_tick(now_ns):
+    global last_click_time, time_taken
+
+    if probes:
+        if control.resumed:
+            probes.last_tick_ns = None # time spent blocked while idle is not jitter
+        probes.tick(now_ns, control.period_ns)
+        probes.maybe_fold()
+        if dumper:
+            dumper.maybe_dump(now_ns)
+
+    moved = motion.is_set()
+    if moved:
+        motion.clear()
+    while commands:
+        event = commands.popleft()
         click_occurred = False
         
         if event.type == pygame.MOUSEBUTTONDOWN:
             click_occurred = True
-            pos = pygame.mouse.get_pos()
+            pos = mouse.get_pos()
         elif event.type == pygame.KEYDOWN:
             if event.key in (pygame.K_s, pygame.K_d):
                 click_occurred = True
-                pos = pygame.mouse.get_pos()
+                pos = mouse.get_pos()
+            elif event.key in SWITCH_KEYS:
+                # Takes effect before the next sample; never blocks this loop
+                aim_assist.request(SWITCH_KEYS[event.key])
         
         if click_occurred and circles:
             current_circle = circles[0]
-            if current_circle.check_click(pos):
+            hit = current_circle.check_click(pos)
+            if recorder:
+                recorder.click(pos[0], pos[1], hit)
+            if hit:
 
                 time_taken = time.time() - last_click_time
                 last_click_time = time.time()
@@ -104,31 +257,135 @@ while running:
                 if circles:
                     next_circle = Circle()
                     circles.append(next_circle)
+                retarget()
+                if field:
+                    refresh_field()
+                if recorder and circles:
+                    recorder.spawn(circles[0].x, circles[0].y)
+
+    # Update aim assist. A tick without motion events has nothing to do; the pipeline still
+    # collects corrections.
+    if moved or PIPELINE:
+        if field:
+            rel = mouse.get_rel()
+            if rel[0] != 0 or rel[1] != 0:
+                x, y = mouse.get_pos()
+                fx, fy = field.delta(x, y)
+                mouse.set_pos(x + fx, y + fy)
+        else:
+            rel = aim_assist.step()
+        mouse.flush()
+        cur_pos = mouse.get_pos()
+        if recorder and (rel[0] != 0 or rel[1] != 0):
+            recorder.sample(rel[0], rel[1], cur_pos[0], cur_pos[1])
+    else:
+        cur_pos = state.get()[0]
+
+    snapshot = (cur_pos, tuple(circles), time_taken)
+    if snapshot != state.get():
+        state.put(snapshot)
+        if not redraw_posted.is_set():
+            redraw_posted.set()
+            pygame.event.post(pygame.event.Event(REDRAW))
+
+# Blocks the control loop while the mouse is still, until the main thread sees input
+def wait_for_input(timeout):
+    debuglog.flush_all()
+    wake.wait(timeout)
+    wake.clear()
+
+# Main thread: passes input on to the control loop; False on quit
+def handle_event(event):
+    if event.type == pygame.QUIT:
+        return False
+    if event.type == pygame.MOUSEMOTION:
+        motion.set()
+    elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN):
+        commands.append(event)
+    else:
+        return True
+    control.mark_active()
+    wake.set()
+    return True
+
+# Every pending event, after waiting up to `timeout` seconds for the first one
+def next_events(timeout):
+    if timeout > 0:
+        event = pygame.event.wait(max(1, int(timeout * 1000)))
+        if event.type != pygame.NOEVENT:
+            return [event] + pygame.event.get()
+    return pygame.event.get()
+
+def render(current):
+    cur_pos, shown, shown_time = current
+
+    # Clear only what was drawn last frame
+    for rect in render.dirty:
+        screen.fill((0, 0, 0), rect)
+    drawn = []
 
     # Draw time text
-    time_text = font.render(f"Time to click: {time_taken:.3f}s", True, WHITE)
-    screen.blit(time_text, (10, 10))
+    drawn.append(screen.blit(render_time_text(shown_time), (10, 10)))
 
-    if len(circles) > 1:
-        circles[0].draw_line_to_next(screen, circles[1], 0)
+    if len(shown) > 1:
+        drawn.append(shown[0].draw_line_to_next(screen, shown[1], 0))
     
     # Then draw circles
-    for i, circle in enumerate(circles):
-        circle.draw(screen, i)
+    for i, circle in enumerate(shown):
+        drawn.append(circle.draw(screen, i))
     
-    crosshair.draw(screen)
+    drawn.append(crosshair.draw(screen, cur_pos))
 
-    # Get current target position if circles exist
-    target_pos = (circles[0].x, circles[0].y) if circles else None
+    if probes:
+        for i, line in enumerate(render_stats()):
+            drawn.append(screen.blit(line, (10, 50 + i * 18)))
 
-    # Update and draw aim assist
-    rel = pygame.mouse.get_rel()
-    cur_pos = pygame.mouse.get_pos()
-    if rel[0] != 0 or rel[1] != 0:
-        fx, fy = aim_assist.get_fx_fy(cur_pos, target_pos)
-        pygame.mouse.set_pos(cur_pos + np.array([fx, fy]))
+    drawn = [rect for rect in drawn if rect]
+    pygame.display.update(render.dirty + drawn)
+    render.dirty = drawn
 
+render.dirty = []
+
+# Draws at most FRAME_RATE times a second and only when the control loop published a change;
+# the stats overlay still refreshes twice a second. Between frames the thread sleeps in
+# event.wait(), which returns as soon as input arrives, so SDL sees input without frame delay.
+def main_loop():
+    screen.fill((0, 0, 0))
     pygame.display.flip()
-    clock.tick(10000)
+    drawn_state = None
+    next_frame = next_stats = 0.0
+
+    while control.running:
+        now = time.perf_counter()
+        due = state.get() is not drawn_state or (probes and now >= next_stats)
+        timeout = next_frame - now if due else (max(0.0, next_stats - now) if probes else 0.5)
+        for event in next_events(timeout):
+            if not handle_event(event):
+                return
+
+        now = time.perf_counter()
+        current = state.get()
+        if now < next_frame or (current is drawn_state and not (probes and now >= next_stats)):
+            continue
+        redraw_posted.clear()
+        next_frame = now + 1 / FRAME_RATE
+        next_stats = now + 0.5
+        drawn_state = current
+        render(current)
+
+# Game loop
+# The main thread would otherwise hold the GIL for up to the default 5 ms switch interval
+sys.setswitchinterval(1 / CONTROL_RATE / 4)
+control = AdaptiveLoop(CONTROL_RATE, wait_for_input)
+control.running = True
+control.start(control_tick)
+main_loop()
+control.stop()
 
+if PIPELINE:
+    aim_assist.stop()
+if recorder:
+    recorder.close()
+if dumper:
+    dumper.dump()
 pygame.quit()
@@ -0,0 +1,100 @@
+# Cursor motion estimation
+#
+# An alpha-beta-gamma filter tracks position, velocity and acceleration per axis from
+# timestamped samples. Recent samples are also kept in a fixed-size ring buffer for
+# fitted_velocity(), a least-squares velocity over any window of them. After the cursor has
+# been idle the buffer is emptied and the filter restarts at the new position with zero
+# motion; its velocity is seeded from the two-point difference of the first pair of samples.
+
+class MotionEstimator:
+    # alpha, beta, gamma: filter gains (position, velocity, acceleration)
+    # size: ring buffer length
+    # idle_gap: seconds without samples after which the filter and the buffer start over
+    def __init__(self, alpha=0.6, beta=0.2, gamma=0.02, size=16, idle_gap=0.05):
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.size = size
+        self.idle_gap = idle_gap
+        self.ts = [0.0] * size
+        self.xs = [0.0] * size
+        self.ys = [0.0] * size
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.head = 0
+        self.t = None
+        self.x = self.y = 0.0
+        self.vx = self.vy = 0.0
+        self.ax = self.ay = 0.0
+
+    def _push(self, t, x, y):
+        i = self.head
+        self.ts[i], self.xs[i], self.ys[i] = t, x, y
+        self.head = (i + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    # Least-squares velocity over the last n buffered samples
+    def fitted_velocity(self, n=None):
+        n = min(n or self.count, self.count)
+        if n < 2:
+            return 0.0, 0.0
+        idx = [(self.head - 1 - k) % self.size for k in range(n)]
+        t_mean = sum(self.ts[i] for i in idx) / n
+        x_mean = sum(self.xs[i] for i in idx) / n
+        y_mean = sum(self.ys[i] for i in idx) / n
+        stt = sum((self.ts[i] - t_mean)**2 for i in idx)
+        if stt == 0:
+            return 0.0, 0.0
+        vx = sum((self.ts[i] - t_mean) * (self.xs[i] - x_mean) for i in idx) / stt
+        vy = sum((self.ts[i] - t_mean) * (self.ys[i] - y_mean) for i in idx) / stt
+        return vx, vy
+
+    def update(self, t, x, y):
+        last = self.t
+        if last is not None and t - last > self.idle_gap:
+            # Stale motion would only mislead the first samples of a new movement
+            self.count = 0
+        self._push(t, x, y)
+
+        if last is None or t - last > self.idle_gap:
+            self.t, self.x, self.y = t, x, y
+            self.vx = self.vy = self.ax = self.ay = 0.0
+            return
+
+        dt = t - last
+        if dt <= 0:
+            return
+        self.t = t
+
+        if self.count == 2:
+            # Seed velocity from the first pair instead of ramping up from zero
+            self.vx, self.vy = self.fitted_velocity(2)
+
+        half_dt2 = 0.5 * dt * dt
+        px = self.x + self.vx * dt + self.ax * half_dt2
+        py = self.y + self.vy * dt + self.ay * half_dt2
+        rx = x - px
+        ry = y - py
+
+        self.x = px + self.alpha * rx
+        self.y = py + self.alpha * ry
+        self.vx += self.ax * dt + self.beta * rx / dt
+        self.vy += self.ay * dt + self.beta * ry / dt
+        self.ax += self.gamma * rx / half_dt2
+        self.ay += self.gamma * ry / half_dt2
+
+    def velocity(self):
+        return self.vx, self.vy
+
+    def acceleration(self):
+        return self.ax, self.ay
+
+    # Where the cursor will be `lead` seconds after the last sample. Extrapolates from the
+    # last measurement rather than the filtered position, which lags behind it.
+    def predict(self, lead):
+        i = (self.head - 1) % self.size
+        return (self.xs[i] + self.vx * lead + 0.5 * self.ax * lead * lead,
+                self.ys[i] + self.vy * lead + 0.5 * self.ay * lead * lead)
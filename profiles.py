@@ -0,0 +1,195 @@
+# Parameter profiles
+#
+# A profile file is JSON holding named profiles. Each has an optional section per version and
+# one for the trainer layout; missing values take the defaults, and "inherit" starts from
+# another profile:
+#   {
+#       "default": {"v2": {"f_mitigation": 1.0}, "trainer": {"circle_radius": 40}},
+#       "sticky": {"inherit": "default", "v2p1": {"k": 0.7, "distance_cubic": [175, 250, 0.5, 5.0, 0.5, 500]}}
+#   }
+# Loading validates every value once and compiles each version section into the immutable
+# constants it runs on (v1/v2/v2p1.compile_constants), so nothing is re-read or re-derived per
+# sample. ProfileWatcher reloads the file when it changes; a file that does not validate is
+# reported and the running profile kept.
+
+import json
+import os
+import threading
+from collections import namedtuple
+
+Profile = namedtuple('Profile', ['name', 'v1', 'v2', 'v2p1', 'trainer'])
+Trainer = namedtuple('Trainer', ['screen_width', 'screen_height', 'circle_radius', 'margin', 'num_circles'])
+
+TRAINER_DEFAULTS = {'screen_width': 1200, 'screen_height': 700, 'circle_radius': 40, 'margin': 30, 'num_circles': 4}
+
+class ProfileError(ValueError):
+    pass
+
+def _number(minimum=None, maximum=None, exclusive=False):
+    def check(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return "must be a number"
+        if minimum is not None and (value <= minimum if exclusive else value < minimum):
+            return f"must be {'>' if exclusive else '>='} {minimum}"
+        if maximum is not None and value > maximum:
+            return f"must be <= {maximum}"
+        return None
+    return check
+
+def _integer(minimum):
+    def check(value):
+        if isinstance(value, bool) or not isinstance(value, int):
+            return "must be an integer"
+        if value < minimum:
+            return f"must be >= {minimum}"
+        return None
+    return check
+
+# [a, b, k1, k2, k3, s] with 0 < a < b < s and non-negative slopes, not all zero: F(s) is the
+# divisor of F_as_ratio
+def _cubic(value):
+    if not isinstance(value, list) or len(value) != 6 or any(_number()(v) for v in value):
+        return "must be [a, b, k1, k2, k3, s]"
+    a, b, k1, k2, k3, s = value
+    if not 0 < a < b < s:
+        return "needs 0 < a < b < s"
+    if min(k1, k2, k3) < 0:
+        return "slopes must be >= 0"
+    if k1 + k2 + k3 <= 0:
+        return "needs at least one slope > 0"
+    return None
+
+POSITIVE = _number(0, exclusive=True)
+NON_NEGATIVE = _number(0)
+
+SCHEMA = {
+    'v1': {'T': POSITIVE, 'R': NON_NEGATIVE, 'S': NON_NEGATIVE, 'Z': POSITIVE, 'theta': _number(0, 180),
+           'mitigation': POSITIVE},
+    'v2': {'res_factor': POSITIVE, 'U0': NON_NEGATIVE, 'sigma': POSITIVE, 'R': POSITIVE, 'n': POSITIVE,
+           'strength': NON_NEGATIVE, 'f_mitigation': POSITIVE},
+    'v2p1': {'V': POSITIVE, 'sigma': POSITIVE, 'k': _number(0, 1), 'debt_paying_speed': _number(0, 1),
+             'time_limit': POSITIVE, 'distance_limit': POSITIVE, 'speed_limit': POSITIVE, 'slider_k': NON_NEGATIVE,
+             'distance_cubic': _cubic, 'time_cubic': _cubic, 'speed_cubic': _cubic},
+    'trainer': {'screen_width': _integer(1), 'screen_height': _integer(1), 'circle_radius': _integer(1),
+                'margin': _integer(0), 'num_circles': _integer(1)},
+}
+
+def _resolve(profiles, name, seen=()):
+    if name not in profiles:
+        raise ProfileError(f"Unknown profile: {name}")
+    if name in seen:
+        raise ProfileError(f"Inheritance cycle: {' -> '.join(seen + (name,))}")
+    raw = profiles[name]
+    if not isinstance(raw, dict):
+        raise ProfileError(f"{name}: must be an object")
+
+    merged = {}
+    if 'inherit' in raw:
+        if not isinstance(raw['inherit'], str):
+            raise ProfileError(f"{name}.inherit: must be a profile name")
+        merged = _resolve(profiles, raw['inherit'], seen + (name,))
+    for section, values in raw.items():
+        if section != 'inherit':
+            merged[section] = {**merged.get(section, {}), **values} if isinstance(values, dict) else values
+    return merged
+
+def validate(raw, name='profile'):
+    errors = []
+    for section, values in raw.items():
+        if section not in SCHEMA:
+            errors.append(f"{name}: unknown section '{section}'")
+            continue
+        if not isinstance(values, dict):
+            errors.append(f"{name}.{section}: must be an object")
+            continue
+        for key, value in values.items():
+            check = SCHEMA[section].get(key)
+            problem = check(value) if check else "unknown parameter"
+            if problem:
+                errors.append(f"{name}.{section}.{key}: {problem}")
+
+    # A trainer section that is not an object is already in the errors
+    trainer = {**TRAINER_DEFAULTS, **(raw.get('trainer') if isinstance(raw.get('trainer'), dict) else {})}
+    if not errors and 2 * (trainer['margin'] + trainer['circle_radius']) >= min(trainer['screen_width'], trainer['screen_height']):
+        errors.append(f"{name}.trainer: circles do not fit on the screen")
+    if errors:
+        raise ProfileError('; '.join(errors))
+
+# Validated raw sections -> Profile of compiled constants
+def compile_profile(name, raw):
+    import v1
+    import v2
+    import v2p1
+
+    return Profile(
+        name,
+        v1.compile_constants(**raw.get('v1', {})),
+        v2.compile_constants(**raw.get('v2', {})),
+        v2p1.compile_constants(raw.get('v2p1', {})),
+        Trainer(**{**TRAINER_DEFAULTS, **raw.get('trainer', {})}),
+    )
+
+def parse(profiles, name='default'):
+    if not isinstance(profiles, dict):
+        raise ProfileError("A profile file must hold an object of named profiles")
+    raw = _resolve(profiles, name)
+    validate(raw, name)
+    return compile_profile(name, raw)
+
+def load(path, name='default'):
+    with open(path) as f:
+        return parse(json.load(f), name)
+
+# Polls the file's modification time on a background thread and calls on_change(profile) with
+# every new profile that validates. The profile is built completely before it is handed over,
+# and the handover is one reference assignment, so readers see the old or the new profile,
+# never a mix.
+class ProfileWatcher:
+    def __init__(self, path, name='default', on_change=None, interval=0.5):
+        self.path = path
+        self.name = name
+        self.on_change = on_change
+        self.interval = interval
+        self.error = None
+        self.reloads = 0
+        self.mtime = os.stat(path).st_mtime_ns
+        self.profile = load(path, name)
+        self._stop = threading.Event()
+        self.thread = None
+
+    def check(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self.mtime:
+                return False
+            self.mtime = mtime
+            profile = load(self.path, self.name)
+        except (OSError, ValueError) as e:
+            # Also catches half-written files; the next save triggers another attempt
+            self.error = e
+            return False
+
+        self.error = None
+        self.profile = profile
+        self.reloads += 1
+        if self.on_change:
+            self.on_change(profile)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # Whatever a bad file breaks, the watcher stays up for the next save
+                self.error = e
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
@@ -0,0 +1,172 @@
+# Session recording
+#
+# Append-only binary file: a 32 byte header followed by fixed-width records.
+# The records section is a plain array of RECORD_DTYPE, so it can be memory-mapped and
+# used as a NumPy structured array directly (see load()).
+
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b'AA2DREC1'
+VERSION = 1
+HEADER = struct.Struct('<8sHxxIq8x') # magic, version, rate (Hz), wall clock start (ns)
+HEADER_SIZE = HEADER.size
+
+# Kinds
+SAMPLE = 0 # dx, dy: raw delta, x, y: corrected cursor position
+SPAWN = 1  # x, y: new current target, flags: 1 if slider
+CLICK = 2  # x, y: cursor position, flags: 1 if it hit the target
+
+RECORD_DTYPE = np.dtype([
+    ('t', '<i8'),  # ns since the start of the session (perf_counter_ns)
+    ('kind', 'u1'),
+    ('flags', 'u1'),
+    ('dx', '<i2'),
+    ('dy', '<i2'),
+    ('x', '<f4'),
+    ('y', '<f4'),
+]) # 22 bytes, packed
+
+class Recorder:
+    def __init__(self, path, rate=2000, chunk=4096):
+        self.path = path
+        self.buffer = np.zeros(chunk, dtype=RECORD_DTYPE)
+        self.n = 0
+
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            self.rate, start_ns = read_header(path)
+            # Drop a partially written record left by a crash, so the file stays a whole array
+            size = os.path.getsize(path)
+            whole = HEADER_SIZE + (size - HEADER_SIZE) // RECORD_DTYPE.itemsize * RECORD_DTYPE.itemsize
+            self.file = open(path, 'r+b')
+            self.file.truncate(whole)
+            self.file.seek(whole)
+            # Continue the same timeline
+            self.t0 = time.perf_counter_ns() - (time.time_ns() - start_ns)
+        else:
+            self.rate = rate
+            self.file = open(path, 'wb')
+            self.file.write(HEADER.pack(MAGIC, VERSION, rate, time.time_ns()))
+            self.t0 = time.perf_counter_ns()
+
+    def _append(self, kind, flags, dx, dy, x, y):
+        self.buffer[self.n] = (time.perf_counter_ns() - self.t0, kind, flags, dx, dy, x, y)
+        self.n += 1
+        if self.n == len(self.buffer):
+            self.flush()
+
+    def sample(self, dx, dy, x, y):
+        self._append(SAMPLE, 0, dx, dy, x, y)
+
+    def spawn(self, x, y, slider=False):
+        self._append(SPAWN, int(slider), 0, 0, x, y)
+
+    def click(self, x, y, hit):
+        self._append(CLICK, int(hit), 0, 0, x, y)
+
+    def flush(self):
+        if self.n:
+            self.file.write(self.buffer[:self.n].tobytes())
+            self.n = 0
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        magic, version, rate, start_ns = HEADER.unpack(f.read(HEADER_SIZE))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a v{VERSION} recording")
+    return rate, start_ns
+
+# Memory-mapped, read-only view of every record; nothing is parsed or copied
+def load(path):
+    rate, _ = read_header(path)
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE), rate
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,)), rate
+
+# Puts the recorded deltas back on a fixed `rate` grid (idle periods are not recorded) for sim.simulate()
+def to_trace(records, rate):
+    from sim import Trace
+
+    samples = records[records['kind'] == SAMPLE]
+    spawns = records[records['kind'] == SPAWN]
+    if len(samples) == 0:
+        return Trace(np.zeros((0, 2), dtype=int), [], rate=rate)
+
+    # The grid starts with the recording, so targets that spawn before the first motion keep their place
+    t0 = records['t'][0]
+    idx = np.round((samples['t'] - t0) * (rate / 1e9)).astype(np.int64)
+    deltas = np.zeros((idx[-1] + 1, 2), dtype=np.int64)
+    np.add.at(deltas, idx, np.stack([samples['dx'], samples['dy']], axis=1))
+
+    spawn_idx = np.clip(np.round((spawns['t'] - t0) * (rate / 1e9)), 0, len(deltas) - 1).astype(np.int64)
+    start = (float(samples['x'][0] - samples['dx'][0]), float(samples['y'][0] - samples['dy'][0]))
+    return Trace(deltas, zip(spawn_idx.tolist(), spawns['x'].tolist(), spawns['y'].tolist()), start, rate)
+
+# The same grid as to_trace() as consecutive sim.Trace pieces for sim.Session.run(): each piece
+# after the first starts on a spawn and is about `chunk` samples long, and the records are read
+# `block` at a time, so memory stays bounded however long the recording is
+def iter_traces(records, rate, chunk=65536, block=1 << 20):
+    from sim import Trace
+
+    if len(records) == 0:
+        return
+    t0 = records['t'][0]
+    idx = np.zeros(0, dtype=np.int64) # grid index of every sample not yet in a piece
+    moves = np.zeros((0, 2), dtype=np.int64)
+    spawns = [] # (grid index, x, y) not yet in a piece
+    piece_start = 0
+    end = 0 # one past the last sample seen
+    pos = None # raw cursor position at piece_start
+
+    def piece(stop):
+        nonlocal idx, moves, spawns, piece_start, pos
+        deltas = np.zeros((stop - piece_start, 2), dtype=np.int64)
+        inside = idx < stop
+        np.add.at(deltas, idx[inside] - piece_start, moves[inside])
+        local = [(min(i, stop - 1) - piece_start, x, y) for i, x, y in spawns if i < stop or stop == end]
+        trace = Trace(deltas, local, pos, rate)
+        idx, moves = idx[~inside], moves[~inside]
+        spawns = [s for s in spawns if s[0] >= stop and stop != end]
+        pos = pos[0] + float(deltas[:, 0].sum()), pos[1] + float(deltas[:, 1].sum())
+        piece_start = stop
+        return trace
+
+    for i in range(0, len(records), block):
+        r = records[i:i + block]
+        samples = r[r['kind'] == SAMPLE]
+        spawned = r[r['kind'] == SPAWN]
+        if pos is None and len(samples):
+            pos = (float(samples['x'][0] - samples['dx'][0]), float(samples['y'][0] - samples['dy'][0]))
+        at = np.round((samples['t'] - t0) * (rate / 1e9)).astype(np.int64)
+        idx = np.concatenate([idx, at])
+        moves = np.concatenate([moves, np.stack([samples['dx'], samples['dy']], axis=1).astype(np.int64)])
+        at = np.round((spawned['t'] - t0) * (rate / 1e9)).astype(np.int64)
+        spawns.extend(zip(at.tolist(), spawned['x'].tolist(), spawned['y'].tolist()))
+        if len(samples):
+            end = int(idx[-1]) + 1
+
+        # Cut at spawns that are far enough along and that a later sample has already passed
+        while pos is not None:
+            cut = next((s[0] for s in spawns if s[0] >= piece_start + chunk), None)
+            if cut is None or cut >= end:
+                break
+            yield piece(cut)
+
+    if pos is not None:
+        yield piece(end)
+
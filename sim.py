@@ -0,0 +1,208 @@
+# Headless simulator
+#
+# Replays a stream of raw mouse deltas and target spawns through any assist version,
+# with an in-memory cursor and a virtual clock instead of pygame and time.time().
+# Everything is deterministic, so the same trace always gives bit-for-bit the same result.
+
+import contextlib
+from collections import namedtuple
+
+import numpy as np
+
+import debuglog
+from backend import BatchedBackend, VirtualMouse
+from strategy import HotSwap, create
+
+HIT_RADIUS = 40 # same as play.CIRCLE_RADIUS
+
+class VirtualClock:
+    def __init__(self, t=0.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+    def advance(self, dt):
+        self.t += dt
+
+# deltas: (T, 2) raw mouse counts, one row per sample at `rate` Hz
+# spawns: (sample_index, x, y) in order; a target stays current until the next spawn
+class Trace:
+    def __init__(self, deltas, spawns, start=(600, 350), rate=2000):
+        self.deltas = np.asarray(deltas).reshape(-1, 2)
+        self.spawns = sorted((int(i), x, y) for i, x, y in spawns)
+        self.start = start
+        self.rate = rate
+
+    def __len__(self):
+        return len(self.deltas)
+
+    def save(self, path):
+        spawns = np.array(self.spawns, dtype=float).reshape(-1, 3)
+        np.savez_compressed(path, deltas=self.deltas, spawns=spawns, start=np.asarray(self.start), rate=self.rate)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            spawns = [(int(i), x, y) for i, x, y in data['spawns'].tolist()]
+            return cls(data['deltas'], spawns, tuple(data['start'].tolist()), int(data['rate']))
+
+TargetResult = namedtuple('TargetResult', ['index', 'x', 'y', 'spawn_time', 'hit_time', 'overshoot'])
+
+class SimResult:
+    def __init__(self, version, positions, targets, rate):
+        self.version = version
+        self.positions = positions # (T, 2) cursor after each sample
+        self.targets = targets
+        self.rate = rate
+
+    def hit_times(self):
+        return np.array([t.hit_time if t.hit_time is not None else np.nan for t in self.targets])
+
+    def overshoots(self):
+        return np.array([t.overshoot for t in self.targets])
+
+# probes: optional instrument.Probes to time the assist's per-sample stages
+# subpixel: put output.SubpixelMouse between the assist and the cursor
+# batched: coalesce the cursor writes of each sample through backend.BatchedBackend
+# switches: {sample index: strategy name} to hot-swap versions mid-trace (strategy.HotSwap);
+# kwargs then go to the first version only
+# profile: profiles.Profile whose constants replace the defaults of every version
+def simulate(trace, version='v2p1', hit_radius=HIT_RADIUS, integer=True, quiet=True, probes=None, subpixel=False,
+             batched=False, switches=None, profile=None, **kwargs):
+    session = Session(version, trace.start, trace.rate, hit_radius, integer, quiet, probes, subpixel, batched,
+                      switches, profile, **kwargs)
+    return session.run(trace)
+
+# Replays consecutive pieces of one long trace (e.g. the chunks of synth.generate()), one
+# SimResult per piece, with the cursor, clock and assist carried over between them. Pieces
+# must start on a target spawn for the scores to be exact; the next target of a piece's last
+# spawn is not known (it only matters to v1).
+def simulate_stream(traces, version='v2p1', **kwargs):
+    session = None
+    for trace in traces:
+        if session is None:
+            session = Session(version, trace.start, trace.rate, **kwargs)
+        yield session.run(trace)
+
+# An in-memory trace as pieces for simulate_stream(): each piece after the first starts on the
+# first spawn at least `chunk` samples after the start of the one before
+def split(trace, chunk=65536):
+    cuts = [0]
+    for i, _, _ in trace.spawns:
+        if i >= cuts[-1] + chunk and i < len(trace):
+            cuts.append(i)
+    cuts.append(len(trace))
+    start = trace.start
+    for lo, hi in zip(cuts, cuts[1:]):
+        deltas = trace.deltas[lo:hi]
+        last = hi == len(trace)
+        spawns = [(i - lo, x, y) for i, x, y in trace.spawns if lo <= i and (i < hi or last)]
+        yield Trace(deltas, spawns, start, trace.rate)
+        start = start[0] + int(deltas[:, 0].sum()), start[1] + int(deltas[:, 1].sum())
+
+# The state simulate() keeps between samples; arguments as simulate()
+class Session:
+    def __init__(self, version='v2p1', start=(600, 350), rate=2000, hit_radius=HIT_RADIUS, integer=True, quiet=True,
+                 probes=None, subpixel=False, batched=False, switches=None, profile=None, **kwargs):
+        self.version = version
+        self.rate = rate
+        self.hit_radius = hit_radius
+        self.quiet = quiet
+        self.switches = switches
+        self.clock = VirtualClock()
+        self.mouse = VirtualMouse(start, integer=integer)
+        self.backend = BatchedBackend(self.mouse) if batched else self.mouse
+        if subpixel:
+            from output import SubpixelMouse
+            self.backend = SubpixelMouse(self.backend)
+
+        on_build = None
+        if probes is not None:
+            from instrument import instrument_assist
+            on_build = lambda s: instrument_assist(probes, s.assist)
+        if switches:
+            self.strategy = HotSwap(version, self.backend, self.clock, options={version: kwargs}, on_build=on_build,
+                                    profile=profile)
+        else:
+            self.strategy = create(version, self.backend, self.clock, profile, **kwargs)
+            if on_build:
+                on_build(self.strategy)
+        self.samples = 0 # replayed so far, for the sample indices of `switches`
+
+    def run(self, trace):
+        clock, mouse, backend, strategy, switches = self.clock, self.mouse, self.backend, self.strategy, self.switches
+        start = mouse.get_pos()
+        dt = 1.0 / self.rate
+        spawns = trace.spawns
+        deltas = trace.deltas.tolist()
+        positions = np.empty((len(deltas), 2))
+
+        with contextlib.ExitStack() as stack:
+            if self.quiet:
+                stack.enter_context(debuglog.suppressed())
+
+            s = 0
+            for i, (dx, dy) in enumerate(deltas):
+                clock.advance(dt)
+                if switches and self.samples + i in switches:
+                    strategy.request(switches[self.samples + i], wait=True)
+                while s < len(spawns) and spawns[s][0] == i:
+                    nxt = spawns[s + 1][1:] if s + 1 < len(spawns) else None
+                    strategy.set_target(spawns[s][1:], nxt)
+                    s += 1
+                mouse.move(dx, dy)
+                strategy.step()
+                backend.flush()
+                positions[i] = mouse.get_pos()
+
+        self.samples += len(deltas)
+        return SimResult(self.version, positions, _score_targets(positions, spawns, start, self.hit_radius, dt),
+                         self.rate)
+
+# hit_time: seconds from spawn until the cursor is first within hit_radius
+# overshoot: how far the cursor went past the target centre along the approach direction
+def _score_targets(positions, spawns, start, hit_radius, dt):
+    results = []
+    for n, (i, x, y) in enumerate(spawns):
+        end = spawns[n + 1][0] if n + 1 < len(spawns) else len(positions)
+        if i >= end:
+            results.append(TargetResult(n, x, y, (i + 1) * dt, None, 0.0))
+            continue
+
+        path = positions[i:end]
+        origin = positions[i - 1] if i > 0 else np.asarray(start, dtype=float)
+        approach = np.array([x, y], dtype=float) - origin
+        offset = path - (x, y)
+
+        inside = np.flatnonzero(np.hypot(offset[:, 0], offset[:, 1]) <= hit_radius)
+        hit_time = float(inside[0] + 1) * dt if len(inside) else None
+
+        norm = np.hypot(*approach)
+        overshoot = max(0.0, float((offset @ approach).max() / norm)) if norm > 0 else 0.0
+
+        results.append(TargetResult(n, x, y, (i + 1) * dt, hit_time, overshoot))
+    return results
+
+# Straight flick towards each target with a minimum-jerk speed profile; handy for smoke tests.
+def straight_trace(targets, start=(600, 350), rate=2000, move_time=0.25, hold_time=0.1):
+    deltas = []
+    spawns = []
+    pos = np.asarray(start, dtype=float)
+    sent = np.round(pos)
+    n_move = int(move_time * rate)
+    tau = np.arange(1, n_move + 1) / n_move
+    profile = 10 * tau**3 - 15 * tau**4 + 6 * tau**5
+
+    for x, y in targets:
+        spawns.append((len(deltas), x, y))
+        path = pos + np.outer(profile, np.array([x, y]) - pos)
+        # Integer mouse counts, with the rounding error carried forward
+        points = np.round(path)
+        steps = np.diff(np.vstack([sent, points]), axis=0)
+        deltas.extend(steps.astype(int).tolist())
+        deltas.extend([[0, 0]] * int(hold_time * rate))
+        pos = np.array([x, y], dtype=float)
+        sent = points[-1]
+
+    return Trace(np.array(deltas, dtype=int), spawns, start, rate)
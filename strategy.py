@@ -0,0 +1,198 @@
+# Assist strategies
+#
+# One interface over the three versions, whose constructors and call shapes all differ:
+#   set_target(target, next_target=None, now=None)   when the current target changes
+#   step(now=None)                                    once per input sample; returns the raw (dx, dy)
+#   resume(target, next_target=None, now=None)        take over a cursor another strategy was driving
+#   configure(constants)                              compiled constants from a profile (profiles.py)
+# Every strategy reads and moves the cursor through a backend (see backend.py), and is created
+# by name from STRATEGIES, so the trainer, the simulator and the benchmarks select versions
+# the same way. HotSwap switches between them at runtime.
+
+import threading
+import time
+
+STRATEGIES = {}
+
+def register(name):
+    def decorate(cls):
+        cls.name = name
+        STRATEGIES[name] = cls
+        return cls
+    return decorate
+
+# The constants of `profile` for version `name`, except those that `options`, the version's
+# constructor kwargs, set themselves: e.g. play.py fixes the mitigation at 1.0 behind
+# output.SubpixelMouse, which a profile's defaults must not undo
+def profile_constants(profile, name, options):
+    constants = getattr(profile, name)
+    return constants._replace(**{key: value for key, value in options.items() if key in constants._fields})
+
+# profile: optional profiles.Profile; its constants for this version replace the defaults,
+# other than those given in kwargs
+def create(name, backend, clock=time.monotonic, profile=None, **kwargs):
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {name}")
+    strategy = STRATEGIES[name](backend, clock, **kwargs)
+    if profile is not None:
+        strategy.configure(profile_constants(profile, name, kwargs))
+    return strategy
+
+class Strategy:
+    name = None
+    entry_point = None # per-sample method of self.assist, for instrument.py and bench.py
+
+    def __init__(self, backend, clock=time.monotonic):
+        self.backend = backend
+        self.clock = clock
+        self.assist = None
+        self.target = None
+        self.next_target = None
+
+    def set_target(self, target, next_target=None, now=None):
+        self.target, self.next_target = target, next_target
+
+    def step(self, now=None):
+        raise NotImplementedError
+
+    def resume(self, target, next_target=None, now=None):
+        self.set_target(target, next_target, now)
+
+    def configure(self, constants):
+        self.assist.configure(constants)
+
+@register('v1')
+class V1Strategy(Strategy):
+    entry_point = 'update'
+
+    def __init__(self, backend, clock=time.monotonic, **kwargs):
+        super().__init__(backend, clock)
+        from v1 import AimAssist
+        self.assist = AimAssist(None, backend=backend, **kwargs)
+
+    def set_target(self, target, next_target=None, now=None):
+        super().set_target(target, next_target, now)
+        self.assist.reset_Z()
+
+    def step(self, now=None):
+        rel = self.backend.get_rel()
+        self.assist.update(self.target, self.next_target, rel)
+        return rel
+
+@register('v2')
+class V2Strategy(Strategy):
+    entry_point = 'update'
+
+    def __init__(self, backend, clock=time.monotonic, res_factor=1.0, **kwargs):
+        super().__init__(backend, clock)
+        from v2 import AimAssist
+        self.assist = AimAssist(res_factor, clock=clock, backend=backend, **kwargs)
+
+    def step(self, now=None):
+        rel = self.backend.get_rel()
+        self.assist.update(self.target, now, rel)
+        return rel
+
+    def resume(self, target, next_target=None, now=None):
+        # Motion seen by the other strategy is not in the estimator
+        if self.assist.estimator is not None:
+            self.assist.estimator.reset()
+        super().resume(target, next_target, now)
+
+@register('v2p1')
+class V2p1Strategy(Strategy):
+    entry_point = 'update_as_delta'
+
+    def __init__(self, backend, clock=time.monotonic, **kwargs):
+        super().__init__(backend, clock)
+        from v2p1 import AimAssistV2p1
+        self.assist = AimAssistV2p1(clock=clock, backend=backend, **kwargs)
+
+    def set_target(self, target, next_target=None, now=None):
+        super().set_target(target, next_target, now)
+        # Before the first target the assist is idle, so pick up wherever the cursor went
+        if self.assist.get_target_position() is None:
+            self.assist.reset()
+        if target is not None:
+            self.assist.set_target_position(*target, now=now)
+
+    def step(self, now=None):
+        dx, dy = self.backend.get_rel()
+        self.assist.update_as_delta(dx, dy, now)
+        return dx, dy
+
+    def resume(self, target, next_target=None, now=None):
+        # Debt is measured against positions this assist wrote, which no longer hold
+        self.assist.reset()
+        if self.assist.estimator is not None:
+            self.assist.estimator.reset()
+        super().resume(target, next_target, now)
+
+# Runs one strategy at a time and switches between samples. request() never blocks the
+# control loop: a strategy that has not been built yet is built on a background thread and
+# handed over with a single reference assignment, which step() picks up before its next
+# sample. Every built strategy is kept, so switching back finds it as it was left.
+# Profiles are handed over the same way with set_profile().
+# options: per-name constructor kwargs, e.g. {'v2': {'f_mitigation': 1.0}}; they win over a profile
+# on_build: called with every newly built strategy (e.g. to instrument it)
+class HotSwap(Strategy):
+    def __init__(self, name, backend, clock=time.monotonic, options=None, on_build=None, profile=None):
+        super().__init__(backend, clock)
+        self.options = options or {}
+        self.on_build = on_build
+        self.profile = profile
+        self.pending_profile = None
+        self.instances = {}
+        self.current = self._build(name)
+        self.assist = self.current.assist
+        self.pending = None
+        self.swaps = 0
+
+    @property
+    def name(self):
+        return self.current.name
+
+    def _build(self, name):
+        strategy = create(name, self.backend, self.clock, self.profile, **self.options.get(name, {}))
+        if self.on_build:
+            self.on_build(strategy)
+        self.instances[name] = strategy
+        return strategy
+
+    def _build_pending(self, name):
+        self.pending = self._build(name)
+
+    def request(self, name, wait=False):
+        if name not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {name}")
+        if name in self.instances:
+            self.pending = self.instances[name]
+        elif wait:
+            self._build_pending(name)
+        else:
+            threading.Thread(target=self._build_pending, args=(name,), daemon=True).start()
+
+    # Safe from any thread; applied to every built strategy before the next sample
+    def set_profile(self, profile):
+        self.pending_profile = profile
+
+    def set_target(self, target, next_target=None, now=None):
+        super().set_target(target, next_target, now)
+        self.current.set_target(target, next_target, now)
+
+    def step(self, now=None):
+        profile = self.pending_profile
+        if profile is not None:
+            self.pending_profile = None
+            self.profile = profile
+            for strategy in list(self.instances.values()):
+                strategy.configure(profile_constants(profile, strategy.name, self.options.get(strategy.name, {})))
+        pending = self.pending
+        if pending is not None:
+            self.pending = None
+            if pending is not self.current:
+                pending.resume(self.target, self.next_target, now)
+                self.current = pending
+                self.assist = pending.assist
+                self.swaps += 1
+        return self.current.step(now)
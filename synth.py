@@ -0,0 +1,198 @@
+# Synthetic mouse traces
+#
+# Seeded stand-in for a human playing the trainer: targets are placed like Circle.respawn in
+# play.py, and each one is reached with a reaction delay, a Fitts'-law-timed minimum-jerk
+# primary submovement that over- or undershoots with endpoint scatter, and corrective
+# submovements until the cursor is on the target, followed by a dwell before the click.
+# Hand tremor is added on top and the path is quantized to integer mouse counts.
+#
+# generate() is a generator of sim.Trace pieces of about `chunk` samples that each start on a
+# spawn, so a session of any length streams through sim.simulate_stream() or onto disk
+# without ever being held in memory:
+#
+#   for result in sim.simulate_stream(synth.generate(seed=1, rate=8000, targets=10000), 'v2p1'): ...
+#   python synth.py corpus.aarec --targets 5000 --rate 8000 --seed 1
+#
+# The trace is open loop, like a recording: the simulated hand does not react to the assist.
+
+import argparse
+import functools
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from profiles import TRAINER_DEFAULTS, Trainer
+from sim import Trace
+
+# Every (mean, sd) is sampled per target or submovement; times are in seconds
+Model = namedtuple('Model', [
+    'reaction',        # (mean, sd) from spawn to movement onset
+    'fitts',           # (a, b): movement time = a + b * log2(D / W + 1), W = target diameter
+    'overshoot',       # (mean, sd) relative amplitude error of a submovement; > 0 overshoots
+    'scatter',         # endpoint sd across the movement, relative to its distance
+    'correction',      # (mean, sd) pause before a corrective submovement
+    'max_corrections', # after this many the last correction lands on the target exactly
+    'dwell',           # (mean, sd) from landing on the target to the click that spawns the next one
+    'tremor',          # sd of the per-sample hand tremor, in pixels
+])
+
+DEFAULT_MODEL = Model(reaction=(0.2, 0.04), fitts=(0.1, 0.15), overshoot=(0.04, 0.08), scatter=0.04,
+                      correction=(0.06, 0.015), max_corrections=3, dwell=(0.08, 0.02), tremor=0.25)
+
+# 10t^3 - 15t^4 + 6t^5 over n samples, ending at exactly 1
+@functools.lru_cache(maxsize=256)
+def _min_jerk(n):
+    tau = np.arange(1, n + 1) / n
+    profile = tau**3 * (10 - 15 * tau + 6 * tau**2)
+    profile.flags.writeable = False
+    return profile
+
+def _duration(rng, mean_sd):
+    return max(0.0, rng.normal(*mean_sd))
+
+# Circle.respawn: uniform over the integer positions that keep the whole circle on screen
+def spawn_target(rng, layout):
+    inset = layout.margin + layout.circle_radius
+    return (int(rng.integers(inset, layout.screen_width - inset + 1)),
+            int(rng.integers(inset, layout.screen_height - inset + 1)))
+
+class _Hand:
+    def __init__(self, rng, model, layout, rate, start):
+        self.rng = rng
+        self.model = model
+        self.layout = layout
+        self.rate = rate
+        self.pos = np.array(start, dtype=float) # where the hand means to be
+        self.sent = np.round(self.pos) # counts sent so far, summed
+
+    def _hold(self, seconds):
+        return np.zeros((int(round(seconds * self.rate)), 2), dtype=np.int64)
+
+    def _move(self, endpoint):
+        m = self.model
+        distance = math.hypot(*(endpoint - self.pos))
+        duration = m.fitts[0] + m.fitts[1] * math.log2(distance / (2 * self.layout.circle_radius) + 1)
+        path = self.pos + np.outer(_min_jerk(max(2, int(round(duration * self.rate)))), endpoint - self.pos)
+        if m.tremor:
+            path += self.rng.normal(0.0, m.tremor, path.shape)
+        # Integer mouse counts, with the rounding error carried forward
+        points = np.round(path)
+        points[-1] = np.round(endpoint)
+        steps = np.diff(points, axis=0, prepend=self.sent[None])
+        self.pos = endpoint
+        self.sent = points[-1]
+        return steps.astype(np.int64)
+
+    # Samples from the spawn of `target` to the click on it
+    def reach(self, target):
+        m, rng = self.model, self.rng
+        target = np.asarray(target, dtype=float)
+        pieces = [self._hold(_duration(rng, m.reaction))]
+        for n in range(m.max_corrections + 1):
+            if n:
+                pieces.append(self._hold(_duration(rng, m.correction)))
+            offset = target - self.pos
+            if n == m.max_corrections:
+                pieces.append(self._move(target))
+                break
+            # Amplitude error along the movement, scatter across it
+            along = offset * (1 + rng.normal(*m.overshoot))
+            across = np.array([-offset[1], offset[0]]) * rng.normal(0.0, m.scatter)
+            pieces.append(self._move(self.pos + along + across))
+            if math.hypot(*(np.round(self.pos) - target)) <= self.layout.circle_radius * 0.8:
+                break
+        pieces.append(self._hold(_duration(rng, m.dwell)))
+        return np.concatenate(pieces)
+
+# Endless (targets=None) or `targets` long session as sim.Trace pieces of about `chunk` samples
+# rate: samples per second, e.g. 1000 to 8000
+# layout: profiles.Trainer, by default the layout play.py starts with
+# start: initial cursor position, by default the centre of the screen
+def generate(seed=0, rate=2000, targets=None, chunk=65536, model=DEFAULT_MODEL, layout=None, start=None):
+    if rate <= 0:
+        raise ValueError(f"Invalid sample rate: {rate}")
+    rng = np.random.default_rng(seed)
+    layout = layout or Trainer(**TRAINER_DEFAULTS)
+    start = start or (layout.screen_width // 2, layout.screen_height // 2)
+    hand = _Hand(rng, model, layout, rate, start)
+
+    n = 0
+    while targets is None or n < targets:
+        piece_start = tuple(int(v) for v in hand.sent)
+        pieces, spawns, length = [], [], 0
+        while length < chunk and (targets is None or n < targets):
+            target = spawn_target(rng, layout)
+            spawns.append((length, *target))
+            pieces.append(hand.reach(target))
+            length += len(pieces[-1])
+            n += 1
+        yield Trace(np.concatenate(pieces), spawns, piece_start, rate)
+
+# The pieces of generate() as one Trace; only for sessions that fit in memory
+def join(pieces):
+    deltas, spawns, first = [], [], None
+    length = 0
+    for piece in pieces:
+        if first is None:
+            first = piece
+        deltas.append(piece.deltas)
+        spawns.extend((i + length, x, y) for i, x, y in piece.spawns)
+        length += len(piece)
+    if first is None:
+        return Trace(np.zeros((0, 2), dtype=np.int64), [])
+    return Trace(np.concatenate(deltas), spawns, first.start, first.rate)
+
+# Streams the pieces into a record.py recording (.aarec), as play.py --record would have
+# written it: samples that moved, and for every target a spawn, preceded by the click that hit
+# the one before. Cursor positions are the raw ones, without assist. Returns the sample count.
+def write_recording(pieces, path):
+    import record
+
+    total = 0
+    with open(path, 'wb') as f:
+        for n, piece in enumerate(pieces):
+            if n == 0:
+                f.write(record.HEADER.pack(record.MAGIC, record.VERSION, piece.rate, 0))
+            ns = 1e9 / piece.rate
+            positions = np.vstack([piece.start, piece.start + np.cumsum(piece.deltas, axis=0)])
+
+            at = np.array([i for i, _, _ in piece.spawns], dtype=np.int64)
+            events = np.zeros((len(at), 2), dtype=record.RECORD_DTYPE)
+            events['t'] = np.round((total + at) * ns)[:, None]
+            events['kind'] = record.CLICK, record.SPAWN
+            events['flags'][:, 0] = 1
+            events['x'][:, 0], events['y'][:, 0] = positions[at].T
+            events['x'][:, 1] = [x for _, x, _ in piece.spawns]
+            events['y'][:, 1] = [y for _, _, y in piece.spawns]
+            events = events.ravel()[1:] if n == 0 else events.ravel() # no click before the first target
+
+            moved = np.flatnonzero(np.any(piece.deltas != 0, axis=1))
+            samples = np.zeros(len(moved), dtype=record.RECORD_DTYPE)
+            samples['t'] = np.round((total + moved) * ns)
+            samples['kind'] = record.SAMPLE
+            samples['dx'], samples['dy'] = piece.deltas[moved].T
+            samples['x'], samples['y'] = positions[moved + 1].T
+
+            # Within a tick, events come before the sample, as in play.py's control loop
+            chunk = np.concatenate([events, samples])
+            f.write(chunk[np.argsort(chunk['t'], kind='stable')].tobytes())
+            total += len(piece)
+    return total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate synthetic mouse traces')
+    parser.add_argument('out', help='.aarec recording (streamed) or .npz sim.Trace (held in memory)')
+    parser.add_argument('--targets', type=int, default=1000)
+    parser.add_argument('--rate', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    pieces = generate(args.seed, args.rate, args.targets)
+    if args.out.endswith('.npz'):
+        trace = join(pieces)
+        trace.save(args.out)
+        samples = len(trace)
+    else:
+        samples = write_recording(pieces, args.out)
+    print(f"{args.targets} targets, {samples} samples ({samples / args.rate:.1f} s) -> {args.out}")
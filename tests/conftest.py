@@ -0,0 +1,8 @@
+# The modules live at the repository root
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# No per-sample debug output from the assists
+os.environ.setdefault('AIMASSIST_DEBUG', '')
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import analyze
+import record
+import synth
+from sim import split
+
+@pytest.fixture(scope='module')
+def session(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('sessions') / 'synth.aarec')
+    synth.write_recording(synth.generate(seed=5, rate=2000, targets=40), path)
+    return path
+
+def _assert_same(a, b):
+    for name in analyze.COLUMNS:
+        np.testing.assert_allclose(a[name], b[name], equal_nan=True, err_msg=name)
+
+@pytest.mark.parametrize('version', ['v2', 'v2p1'])
+def test_streamed_replay_matches_whole_replay(session, version, monkeypatch):
+    records, rate = record.load(session)
+    whole = analyze.analyze_records(analyze.replay_records(record.to_trace(records, rate), version), chunk=5000)
+
+    monkeypatch.setattr(analyze, 'REPLAY_CHUNK', 3000)
+    assert len(list(record.iter_traces(records, rate, analyze.REPLAY_CHUNK))) > 3
+    _assert_same(analyze.analyze_session(session, version, chunk=5000), whole)
+
+def test_iter_traces_matches_to_trace(session):
+    records, rate = record.load(session)
+    whole = record.to_trace(records, rate)
+    pieces = list(record.iter_traces(records, rate, chunk=2000, block=1000))
+    assert all(piece.spawns[0][0] == 0 for piece in pieces[1:])
+    joined = synth.join(pieces)
+    assert np.array_equal(joined.deltas, whole.deltas)
+    assert joined.spawns == whole.spawns
+    assert tuple(joined.start) == tuple(whole.start)
+
+def test_split_matches_the_trace(session):
+    whole = record.to_trace(*record.load(session))
+    pieces = list(split(whole, 2000))
+    assert len(pieces) > 3
+    joined = synth.join(pieces)
+    assert np.array_equal(joined.deltas, whole.deltas)
+    assert joined.spawns == whole.spawns
@@ -0,0 +1,19 @@
+import bench
+from instrument import Probes
+from sim import simulate, straight_trace
+
+TRACE = straight_trace([(900, 300), (400, 500)])
+
+def test_every_entry_point_records_samples():
+    for version, entry in bench.ENTRY_POINTS.items():
+        probes = Probes()
+        simulate(TRACE, version, probes=probes)
+        assert entry in probes.histograms, version
+        assert probes.histograms[entry].summary()['count'] > 0, version
+
+def test_empty_histogram_is_not_within_budget(monkeypatch):
+    monkeypatch.setattr(bench, 'ENTRY_POINTS', {'v2p1': 'missing_stage'})
+    monkeypatch.setattr(bench, '_load_traces', lambda paths, quick: [TRACE])
+    result = bench.run_per_sample()['v2p1']
+    assert result['count'] == 0
+    assert not result['within_budget']
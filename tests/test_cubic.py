@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from cubic import MonotoneCubic
+
+CURVE = (150, 350, 1, 3, 1, 500)
+
+@pytest.mark.parametrize('lut_size', [0, 1001])
+def test_ratio_endpoints(lut_size):
+    forward = MonotoneCubic(*CURVE, lut_size=lut_size)
+    backward = MonotoneCubic(*CURVE, reversed=True, lut_size=lut_size)
+    assert forward.F_as_ratio(0) == 0.0
+    assert forward.F_as_ratio(500) == pytest.approx(1.0, abs=1e-12)
+    assert backward.F_as_ratio(0) == pytest.approx(1.0, abs=1e-12)
+    assert backward.F_as_ratio(500) == 0.0
+    np.testing.assert_allclose(backward.F_as_ratio(np.array([0.0, 500.0])), [1.0, 0.0], atol=1e-12)
+
+def test_matches_pchip():
+    interpolate = pytest.importorskip('scipy.interpolate')
+    pchip = interpolate.PchipInterpolator([0, 150, 350, 500], [0, 150, 750, 900])
+    x = np.linspace(0, 500, 501)
+    np.testing.assert_allclose(MonotoneCubic(*CURVE).F(x), pchip(x), rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(MonotoneCubic(*CURVE, reversed=True).F(x), pchip(500 - x), rtol=1e-12, atol=1e-9)
+    # Reversed ratios are over the top of the curve, not over F(s) = pchip(0) = 0
+    np.testing.assert_allclose(MonotoneCubic(*CURVE, reversed=True).F_as_ratio(x), pchip(500 - x) / pchip(500),
+                               rtol=1e-12, atol=1e-12)
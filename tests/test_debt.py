@@ -0,0 +1,73 @@
+import pytest
+
+from v2p1 import DebtAccount, compile_constants
+
+C = compile_constants()
+DEBT = (30.0, -40.0)
+TARGET, LAST = (900, 500), (600, 500) # 300 px apart
+
+def _account(debt=DEBT, last=LAST, slider=False, now=10.0, last_time=9.5):
+    account = DebtAccount(C)
+    account.on_target(debt, now, TARGET, last, last_time, slider)
+    return account
+
+def _scaled(ratio, debt=DEBT):
+    return pytest.approx((ratio * debt[0], ratio * debt[1]))
+
+def test_idle_without_a_previous_target():
+    account = _account(last=None)
+    assert account.state == DebtAccount.IDLE
+    assert account.pay(10.5) == (0, 0)
+
+def test_idle_when_the_debt_is_under_a_pixel():
+    account = _account(debt=(0.5, 0.5))
+    assert account.state == DebtAccount.IDLE
+    assert account.pay(11.0) == (0, 0)
+
+def test_ramping_follows_the_time_cubic():
+    account = _account()
+    assert account.state == DebtAccount.RAMPING
+    base = C.distance_cubic.F_as_ratio(300 / C.distance_limit * 500)
+    assert account.base_ratio == pytest.approx(base)
+    for uptime in (0.0, 0.25, 1.0, 1.9):
+        ratio = base * C.time_cubic.F_as_ratio(uptime / C.time_limit * 500) * C.debt_paying_speed
+        assert account.pay(10.0 + uptime) == _scaled(ratio)
+        assert account.state == DebtAccount.RAMPING
+
+def test_ramping_distance_is_capped_at_the_limit():
+    account = DebtAccount(C)
+    account.on_target(DEBT, 10.0, (C.distance_limit + 5000, 0), (0, 0), 9.0)
+    assert account.base_ratio == pytest.approx(C.distance_cubic.F_as_ratio(500))
+
+def test_time_limit_settles_to_a_constant_payment():
+    account = _account()
+    base = account.base_ratio
+    expected = _scaled(base * C.time_cubic.F_as_ratio(500) * C.debt_paying_speed)
+    assert account.pay(10.0 + C.time_limit) == expected
+    assert account.state == DebtAccount.CONSTANT
+    # Settled: later samples pay the same, whatever the time
+    assert account.pay(10.0 + C.time_limit + 5.0) == expected
+    assert account.pay(0.0) == expected
+
+def test_slider_pays_a_constant_share_by_speed():
+    account = _account(slider=True, now=10.0, last_time=9.5) # 600 px/s, over the speed limit
+    assert account.state == DebtAccount.CONSTANT
+    ratio = C.speed_cubic.F_as_ratio(C.speed_limit / C.speed_limit * 500) * C.debt_paying_speed
+    assert account.pay(10.1) == _scaled(ratio)
+    assert account.pay(20.0) == _scaled(ratio)
+
+def test_slow_slider_is_not_capped():
+    account = _account(slider=True, now=10.0, last_time=-20.0) # 10 px/s
+    speed = 300 / 30.0
+    assert speed < C.speed_limit
+    ratio = C.speed_cubic.F_as_ratio(speed / C.speed_limit * 500) * C.debt_paying_speed
+    assert account.pay(10.1) == _scaled(ratio)
+
+def test_new_target_restarts_the_ramp():
+    account = _account()
+    account.pay(10.0 + C.time_limit)
+    assert account.state == DebtAccount.CONSTANT
+    account.on_target((10.0, 10.0), 20.0, LAST, TARGET, 19.0)
+    assert account.state == DebtAccount.RAMPING
+    assert account.debt == (10.0, 10.0)
+    assert account.start_time == 20.0
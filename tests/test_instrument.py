@@ -0,0 +1,58 @@
+from backend import VirtualMouse
+from instrument import Probes, instrument_assist
+from strategy import create
+
+class Stage:
+    def run(self, a, scale=1):
+        return a * scale
+
+def test_time_method_passes_keyword_arguments():
+    probes = Probes()
+    stage = Stage()
+    probes.time_method(stage, 'run')
+    assert stage.run(2, scale=3) == 6
+    assert len(probes.histogram('run').pending) == 1
+
+def test_time_method_samples_every_nth_call():
+    probes = Probes()
+    stage = Stage()
+    probes.time_method(stage, 'run', every=4)
+    assert [stage.run(n) for n in range(10)] == list(range(10))
+    assert len(probes.histogram('run').pending) == 3 # calls 0, 4 and 8
+
+def test_count_method_passes_keyword_arguments():
+    probes = Probes()
+    stage = Stage()
+    probes.count_method(stage, 'run')
+    assert stage.run(2, scale=3) == 6
+    assert probes.counters['run'] == 1
+
+def test_one_stage_per_version():
+    for version, stage in (('v1', 'update'), ('v2', 'update'), ('v2p1', 'update_as_delta')):
+        probes = Probes()
+        instrument_assist(probes, create(version, VirtualMouse()).assist)
+        assert list(probes.histograms) == [stage]
+
+def test_new_entries_do_not_disturb_iteration():
+    probes = Probes()
+    probes.histogram('update')
+    probes.count('set_position')
+    histograms = iter(probes.histograms.values())
+    counters = iter(probes.counters.items())
+    next(histograms)
+    next(counters, None)
+    # As the build thread of HotSwap does while the control thread folds
+    instrument_assist(probes, create('v2p1', VirtualMouse()).assist)
+    probes.count('swaps')
+    assert list(histograms) == []
+    assert list(counters) == []
+    assert set(probes.histograms) == {'update', 'update_as_delta'}
+    assert set(probes.counters) == {'set_position', 'swaps'}
+
+def test_counters_survive_new_entries():
+    probes = Probes()
+    stage = Stage()
+    probes.count_method(stage, 'run')
+    probes.count('other')
+    stage.run(1)
+    assert probes.counters == {'run': 1, 'other': 1}
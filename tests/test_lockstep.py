@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+import profiles
+import v2
+from lockstep import simulate_many
+from sim import simulate, straight_trace
+
+TRACE = straight_trace([(900, 300), (400, 500), (700, 650), (620, 360)])
+
+def _v2_profile(p):
+    return profiles.Profile('test', None, v2.compile_constants(**p), None, None)
+
+@pytest.mark.parametrize('params', [{}, {'U0': 3000.0, 'R': 250.0, 'f_mitigation': 1.0}])
+def test_v2_matches_simulate(params):
+    batch = simulate_many(TRACE, 'v2', [params], record=True)
+    single = simulate(TRACE, 'v2', profile=_v2_profile(params))
+    np.testing.assert_array_equal(batch.positions[:, 0], single.positions)
+    np.testing.assert_allclose(batch.overshoots()[0], single.overshoots(), rtol=1e-12)
+
+@pytest.mark.parametrize('params', [{}, {'k': 0.3, 'V': 250.0}])
+def test_v2p1_matches_simulate(params):
+    batch = simulate_many(TRACE, 'v2p1', [params], record=True)
+    single = simulate(TRACE, 'v2p1', params=params)
+    np.testing.assert_array_equal(batch.positions[:, 0], single.positions)
+    np.testing.assert_allclose(batch.overshoots()[0], single.overshoots(), rtol=1e-12)
@@ -0,0 +1,61 @@
+import pytest
+
+from backend import VirtualMouse
+from pipeline import AssistServer, Pipeline
+from sim import straight_trace
+from strategy import create
+
+TRACE = straight_trace([(900, 500), (400, 300), (1100, 700)], start=(600, 350))
+
+def _now(i):
+    return (1_000_000_000 + i * 500_000) * 1e-9
+
+def _targets(i):
+    spawns = TRACE.spawns
+    for s, (at, x, y) in enumerate(spawns):
+        if at == i:
+            yield (x, y), spawns[s + 1][1:] if s + 1 < len(spawns) else None
+
+def _in_process(version):
+    now = [0.0]
+    mouse = VirtualMouse(TRACE.start, integer=False)
+    strategy = create(version, mouse, lambda: now[0])
+    for i, (dx, dy) in enumerate(TRACE.deltas.tolist()):
+        now[0] = _now(i)
+        for target, next_target in _targets(i):
+            strategy.set_target(target, next_target, now[0])
+        mouse.move(dx, dy)
+        if dx or dy:
+            strategy.step(now[0])
+    return mouse.get_pos()
+
+# The assist side only catches up every `lag` samples, so that many samples are in flight
+def _pipelined(version, lag):
+    mouse = VirtualMouse(TRACE.start, integer=False)
+    pipeline = Pipeline(version, mouse)
+    server = AssistServer(pipeline.inputs, pipeline.outputs, version)
+    in_flight = sent = 0
+    try:
+        for i, (dx, dy) in enumerate(TRACE.deltas.tolist()):
+            for target, next_target in _targets(i):
+                pipeline.set_target(target, next_target, _now(i))
+            mouse.move(dx, dy)
+            pipeline.step(_now(i))
+            sent += bool(dx or dy)
+            in_flight = max(in_flight, sent)
+            if i % lag == lag - 1:
+                server.poll()
+                sent = 0
+        server.poll()
+        pipeline.step()
+    finally:
+        pipeline.stop()
+    return mouse.get_pos(), in_flight
+
+@pytest.mark.parametrize('version', ['v1', 'v2', 'v2p1'])
+@pytest.mark.parametrize('lag', [1, 7])
+def test_pipeline_matches_in_process(version, lag):
+    expected = _in_process(version)
+    pos, in_flight = _pipelined(version, lag)
+    assert in_flight == lag
+    assert pos == pytest.approx(expected, abs=1e-6)
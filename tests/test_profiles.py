@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+import profiles
+from backend import VirtualMouse
+from profiles import ProfileError, ProfileWatcher, parse
+from strategy import HotSwap, create
+
+@pytest.mark.parametrize('trainer', [[1, 2], 3, 'wide'])
+def test_trainer_must_be_an_object(trainer):
+    with pytest.raises(ProfileError, match=r"default\.trainer: must be an object"):
+        parse({'default': {'trainer': trainer}})
+
+def test_every_problem_is_reported():
+    with pytest.raises(ProfileError) as e:
+        parse({'default': {'trainer': [], 'v2': {'sigma': -1}, 'v3': {}}})
+    message = str(e.value)
+    assert 'default.trainer: must be an object' in message
+    assert 'default.v2.sigma: must be > 0' in message
+    assert "unknown section 'v3'" in message
+
+def test_inherit_must_be_a_name():
+    with pytest.raises(ProfileError, match='inherit'):
+        parse({'default': {'inherit': ['base']}, 'base': {}})
+
+def test_cubic_with_all_slopes_zero_is_rejected():
+    with pytest.raises(ProfileError, match=r"default\.v2p1\.time_cubic: needs at least one slope > 0"):
+        parse({'default': {'v2p1': {'time_cubic': [350, 500, 0, 0, 0, 600]}}})
+    profile = parse({'default': {'v2p1': {'time_cubic': [350, 500, 0, 1.0, 0, 600]}}})
+    assert profile.v2p1.time_cubic is not None
+
+def _write(path, data, mtime_ns):
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_watcher_keeps_the_profile_on_a_bad_edit(tmp_path):
+    path = str(tmp_path / 'profiles.json')
+    _write(path, {'default': {'v2p1': {'k': 0.6}}}, 1_000_000_000)
+    changes = []
+    watcher = ProfileWatcher(path, on_change=changes.append)
+
+    _write(path, {'default': {'trainer': [1, 2]}}, 2_000_000_000)
+    assert watcher.check() is False
+    assert isinstance(watcher.error, ProfileError)
+    assert watcher.profile.v2p1.k == 0.6
+
+    _write(path, {'default': {'v2p1': {'k': 0.7}}}, 3_000_000_000)
+    assert watcher.check() is True
+    assert watcher.error is None
+    assert [p.v2p1.k for p in changes] == [0.7]
+
+def test_watcher_thread_survives_unexpected_errors(tmp_path, monkeypatch):
+    path = str(tmp_path / 'profiles.json')
+    _write(path, {'default': {}}, 1_000_000_000)
+    watcher = ProfileWatcher(path, interval=0.01)
+
+    def broken(*args):
+        raise TypeError('broken')
+    monkeypatch.setattr(profiles, 'load', broken)
+    watcher.start()
+    try:
+        _write(path, {'default': {}}, 2_000_000_000)
+        for _ in range(200):
+            if watcher.error is not None:
+                break
+            watcher._stop.wait(0.01)
+        assert isinstance(watcher.error, TypeError)
+        assert watcher.thread.is_alive()
+    finally:
+        watcher.stop()
+
+OPTIONS = {'v1': {'mitigation': 1.0}, 'v2': {'f_mitigation': 1.0}}
+
+def test_options_win_over_profile_defaults():
+    # A profile that does not inherit "default" carries the engine's mitigations of 1.5 and 3.5
+    profile = parse({'sticky': {'v1': {'T': 150}, 'v2': {'U0': 2000.0}}}, 'sticky')
+    v1 = create('v1', VirtualMouse(), profile=profile, **OPTIONS['v1']).assist.constants
+    v2 = create('v2', VirtualMouse(), profile=profile, **OPTIONS['v2']).assist.constants
+    assert (v1.T, v1.mitigation) == (150, 1.0)
+    assert (v2.U0, v2.f_mitigation) == (2000.0, 1.0)
+
+    swap = HotSwap('v2', VirtualMouse(), options=OPTIONS)
+    swap.request('v1', wait=True)
+    swap.set_profile(profile)
+    swap.step()
+    v1, v2 = swap.instances['v1'].assist.constants, swap.instances['v2'].assist.constants
+    assert (v1.T, v1.mitigation) == (150, 1.0)
+    assert (v2.U0, v2.f_mitigation) == (2000.0, 1.0)
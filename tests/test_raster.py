@@ -0,0 +1,28 @@
+import pytest
+
+import raster
+
+PARAMS = (150.0, 50.0, 0.5)
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    raster.clear_cache()
+    yield
+    raster.clear_cache()
+
+def test_cache_stays_under_the_cap():
+    size = raster.get_raster('gaussian', PARAMS).nbytes
+    raster.clear_cache()
+    for k in (0.5, 0.6, 0.7):
+        raster.get_raster('gaussian', (150.0, 50.0, k), max_bytes=2 * size + 1)
+    assert len(raster._cache) == 2
+    assert raster._cache_bytes <= 2 * size + 1
+
+def test_oversized_raster_is_not_cached():
+    size = raster.get_raster('gaussian', PARAMS).nbytes
+    with pytest.warns(RuntimeWarning, match='not cached'):
+        r = raster.get_raster('gaussian', (200.0, 50.0, 0.5), max_bytes=size)
+    assert r.nbytes > size
+    # The rasters that fit are kept
+    assert list(raster._cache) == [('gaussian', PARAMS, 0.5)]
+    assert raster._cache_bytes == size
@@ -0,0 +1,35 @@
+import numpy as np
+
+import record
+import synth
+
+def test_round_trip_keeps_the_lead_in(tmp_path):
+    path = str(tmp_path / 'session.aarec')
+    pieces = list(synth.generate(seed=3, rate=2000, targets=6, chunk=2000))
+    original = synth.join(pieces)
+    synth.write_recording(pieces, path)
+
+    trace = record.to_trace(*record.load(path))
+    # The first target spawns at sample 0, a reaction time before the first motion
+    first_motion = int(np.flatnonzero(np.any(original.deltas != 0, axis=1))[0])
+    assert original.spawns[0][0] == 0 < first_motion
+
+    assert trace.rate == original.rate
+    assert tuple(trace.start) == tuple(original.start)
+    assert trace.spawns == original.spawns
+    # Samples after the last motion are not recorded
+    assert np.array_equal(trace.deltas, original.deltas[:len(trace.deltas)])
+    assert not original.deltas[len(trace.deltas):].any()
+
+def test_recorder_round_trip(tmp_path):
+    path = str(tmp_path / 'live.aarec')
+    with record.Recorder(path, rate=1000) as rec:
+        rec.spawn(500, 300)
+        rec.sample(2, 1, 602, 351)
+        rec.click(602, 351, False)
+    records, rate = record.load(path)
+    assert rate == 1000
+    assert list(records['kind']) == [record.SPAWN, record.SAMPLE, record.CLICK]
+    trace = record.to_trace(records, rate)
+    assert trace.spawns[0][1:] == (500, 300)
+    assert tuple(trace.start) == (600.0, 350.0)
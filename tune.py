@@ -0,0 +1,239 @@
+# Parameter sweep for AimAssistV2p1
+#
+# Each candidate parameter set is replayed over a corpus of traces with sim.simulate()
+# and scored (lower is better). Candidates are spread across a process pool, every
+# result is appended to a JSON-lines checkpoint, and rerunning with the same checkpoint
+# skips whatever was already evaluated. With --lockstep every worker replays a whole chunk of
+# candidates at once through lockstep.simulate_many().
+#
+#   python tune.py traces/*.npz --strategy tpe --trials 400 --checkpoint sweep.jsonl --out best.json
+#   AimAssistV2p1.from_file('best.json')
+
+import argparse
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sim import Trace, simulate
+
+# name -> (low, high) for a continuous range, or a list of explicit values
+DEFAULT_SPACE = {
+    'V': (120.0, 220.0),
+    'sigma': (30.0, 80.0),
+    'k': (0.2, 0.8),
+    'distance_cubic.k2': (1.0, 8.0),
+    'time_cubic.k2': (0.5, 4.0),
+    'speed_cubic.k2': (1.0, 5.0),
+    'debt_paying_speed': (0.005, 0.05),
+    'time_limit': (0.5, 4.0),
+    'slider_k': (0.4, 1.0),
+}
+
+MISS_PENALTY = 2.0 # seconds charged for a target that is never reached
+OVERSHOOT_WEIGHT = 0.002 # seconds per pixel of overshoot
+
+def score_result(result):
+    hit = result.hit_times()
+    hit = np.where(np.isnan(hit), MISS_PENALTY, hit)
+    return float(np.mean(hit + OVERSHOOT_WEIGHT * result.overshoots()))
+
+# Traces are loaded once per worker process instead of being pickled with every task
+_corpus = None
+
+def load_trace(path):
+    if path.endswith('.aarec'):
+        import record
+        return record.to_trace(*record.load(path))
+    return Trace.load(path)
+
+def _init_worker(paths):
+    global _corpus
+    _corpus = [load_trace(p) for p in paths]
+
+def _evaluate(params):
+    try:
+        scores = [score_result(simulate(trace, 'v2p1', params=params)) for trace in _corpus]
+    except (ValueError, ZeroDivisionError, OverflowError):
+        return math.inf
+    return float(np.mean(scores))
+
+# One lockstep replay per trace for the whole chunk; a chunk holding a candidate that does not
+# compile falls back to evaluating its candidates one by one
+def _evaluate_many(batch):
+    from lockstep import simulate_many
+
+    try:
+        scores = [score_batch(simulate_many(trace, 'v2p1', batch)) for trace in _corpus]
+    except (ValueError, KeyError, ZeroDivisionError, OverflowError):
+        return [_evaluate(params) for params in batch]
+    return np.mean(scores, axis=0).tolist()
+
+def score_batch(result):
+    return [float(np.mean(np.where(np.isnan(hit), MISS_PENALTY, hit) + OVERSHOOT_WEIGHT * overshoot))
+            for hit, overshoot in zip(result.hit_times(), result.overshoots())]
+
+def _key(params):
+    return json.dumps(params, sort_keys=True)
+
+def _is_range(spec):
+    return isinstance(spec, tuple)
+
+def _values(spec, steps):
+    if _is_range(spec):
+        return np.linspace(spec[0], spec[1], steps).tolist()
+    return list(spec)
+
+def _sample(spec, rng):
+    if _is_range(spec):
+        return float(rng.uniform(*spec))
+    return spec[rng.integers(len(spec))]
+
+def grid_candidates(space, steps=5):
+    names = list(space)
+    for combo in itertools.product(*(_values(space[n], steps) for n in names)):
+        yield dict(zip(names, combo))
+
+def random_candidates(space, rng):
+    while True:
+        yield {name: _sample(spec, rng) for name, spec in space.items()}
+
+# Tree-structured Parzen estimator: model the best `gamma` share of the history and the
+# rest with Gaussian kernels, and keep the random draw that is most likely under the good model.
+def tpe_candidate(space, history, rng, gamma=0.25, n_draws=64):
+    ranked = sorted(history, key=lambda h: h[1])
+    n_good = max(1, int(len(ranked) * gamma))
+    good, bad = ranked[:n_good], ranked[n_good:]
+
+    draws = [{name: _sample(spec, rng) for name, spec in space.items()} for _ in range(n_draws)]
+    # Half the draws are perturbations of good points, so the search can actually converge
+    for d in draws[:n_draws // 2]:
+        base = good[rng.integers(len(good))][0]
+        for name, spec in space.items():
+            if _is_range(spec) and name in base:
+                width = (spec[1] - spec[0]) * 0.1
+                d[name] = float(np.clip(base[name] + rng.normal(0, width), *spec))
+
+    def log_density(d, group):
+        if not group:
+            return 0.0
+        total = 0.0
+        for name, spec in space.items():
+            if not _is_range(spec):
+                continue
+            width = (spec[1] - spec[0]) * 0.1
+            xs = np.array([g[0][name] for g in group if name in g[0]])
+            if len(xs) == 0:
+                continue
+            total += np.log(np.mean(np.exp(-0.5 * ((d[name] - xs) / width)**2)) + 1e-12)
+        return total
+
+    return max(draws, key=lambda d: log_density(d, good) - log_density(d, bad))
+
+def load_checkpoint(path):
+    history = []
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    history.append((entry['params'], entry['score']))
+    return history
+
+def sweep(corpus_paths, space=DEFAULT_SPACE, strategy='random', trials=100, steps=5, seed=0,
+          checkpoint=None, workers=None, n_startup=20, lockstep=0):
+    history = load_checkpoint(checkpoint)
+    done = {_key(p) for p, _ in history}
+    rng = np.random.default_rng(seed)
+    workers = workers or os.cpu_count()
+
+    if strategy == 'grid':
+        source = grid_candidates(space, steps)
+    elif strategy == 'random':
+        source = random_candidates(space, rng)
+    elif strategy == 'tpe':
+        source = None
+    else:
+        raise ValueError(f"Unknown strategy: {strategy}")
+
+    out = open(checkpoint, 'a') if checkpoint else None
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(list(corpus_paths),)) as pool:
+            while len(history) < trials:
+                batch = []
+                while len(batch) < workers * max(lockstep, 1) and len(history) + len(batch) < trials:
+                    if source is not None:
+                        params = next(source, None)
+                        if params is None:
+                            break
+                    elif len(history) < n_startup:
+                        params = {name: _sample(spec, rng) for name, spec in space.items()}
+                    else:
+                        params = tpe_candidate(space, history, rng)
+
+                    # Candidates already in the checkpoint are skipped, which is what makes resuming work
+                    if _key(params) in done:
+                        continue
+                    done.add(_key(params))
+                    batch.append(params)
+
+                if not batch:
+                    break
+
+                if lockstep:
+                    chunks = [batch[i:i + lockstep] for i in range(0, len(batch), lockstep)]
+                    scores = [score for chunk in pool.map(_evaluate_many, chunks) for score in chunk]
+                else:
+                    scores = pool.map(_evaluate, batch)
+
+                for params, score in zip(batch, scores):
+                    history.append((params, score))
+                    if out:
+                        out.write(json.dumps({'params': params, 'score': score}) + '\n')
+                        out.flush()
+    finally:
+        if out:
+            out.close()
+
+    return sorted(history, key=lambda h: h[1])
+
+# Writes the full parameter set (defaults overlaid with the best candidate) for AimAssistV2p1.from_file()
+def export_best(history, path):
+    from v2p1 import AimAssistV2p1
+
+    best_params, best_score = min(history, key=lambda h: h[1])
+    assist = AimAssistV2p1(clock=lambda: 0.0, params=best_params)
+    with open(path, 'w') as f:
+        json.dump(assist.get_params(), f, indent=4)
+    return best_params, best_score
+
+def _load_space(path):
+    with open(path) as f:
+        raw = json.load(f)
+    # JSON has no tuples: [low, high] is a range, {"values": [...]} is a list of choices
+    return {name: spec['values'] if isinstance(spec, dict) else tuple(spec) for name, spec in raw.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Tune AimAssistV2p1 constants over recorded traces')
+    parser.add_argument('corpus', nargs='+', help='trace files (.npz from sim.Trace.save, or .aarec recordings)')
+    parser.add_argument('--strategy', choices=['grid', 'random', 'tpe'], default='random')
+    parser.add_argument('--trials', type=int, default=100)
+    parser.add_argument('--steps', type=int, default=3, help='grid points per range')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--space', help='JSON search space')
+    parser.add_argument('--checkpoint', default='sweep.jsonl')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--out', default='best.json')
+    parser.add_argument('--lockstep', type=int, default=0, metavar='N',
+                        help='candidates per worker replayed together by lockstep.simulate_many')
+    args = parser.parse_args()
+
+    space = _load_space(args.space) if args.space else DEFAULT_SPACE
+    history = sweep(args.corpus, space, args.strategy, args.trials, args.steps, args.seed, args.checkpoint, args.workers,
+                    lockstep=args.lockstep)
+    best_params, best_score = export_best(history, args.out)
+    print(f"{len(history)} candidates, best score {best_score:.4f}")
+    print(json.dumps(best_params, indent=4))
@@ -1,10 +1,15 @@
 # v1
 
-import pygame
 import math
+from collections import namedtuple
+
+import debuglog
+from backend import PygameBackend
 
 PYGAME_MITIGATION = 1.5
 
+_debug = debuglog.get('v1')
+
 def dist(pos1, pos2):
     return math.sqrt((pos1[0] - pos2[0])**2 + (pos1[1] - pos2[1])**2)
 
@@ -23,7 +28,7 @@ def check_angle(A, B, C, threshold):
     
     # Avoid division by zero
     if magnitude_AB == 0 or magnitude_AC == 0:
-        print("One of the vectors has zero length.")
+        _debug("One of the vectors has zero length.")
         return False
     
     # Compute cosine of the angle between AB and AC
@@ -40,7 +45,7 @@ def check_angle(A, B, C, threshold):
     if theta_deg > 90:
         theta_deg = 180 - theta_deg
     
-    print(theta_deg)
+    _debug('%s', theta_deg)
 
     # Check if the angle is approximately 23.2 degrees
     if theta_deg < threshold:
@@ -48,36 +53,47 @@ def check_angle(A, B, C, threshold):
     else:
         return False
 
+# Tunable constants of AimAssist, validated and fixed once (see profiles.py)
+Constants = namedtuple('Constants', ['T', 'R', 'S', 'Z', 'theta', 'mitigation'])
+
+def compile_constants(T=200, R=1.05, S=0.5, Z=45, theta=23.2, mitigation=PYGAME_MITIGATION):
+    # R: pullback, S: boost
+    return Constants(T, R, S, Z, theta, mitigation)
+
 class AimAssist:
-    def __init__(self, surface):
+    # mitigation: makes up for set_pos truncating to whole pixels; use 1.0 with output.SubpixelMouse
+    # backend: cursor backend (see backend.py), pygame's by default
+    def __init__(self, surface, backend=None, mitigation=PYGAME_MITIGATION):
         self.active = False
+        self.configure(compile_constants(mitigation=mitigation))
         self.surface = surface
-        self.original_mouse_pos = pygame.mouse.get_pos()
+        self.backend = backend if backend is not None else PygameBackend()
+        self.original_mouse_pos = self.backend.get_pos()
         self.debug_info = {
             'original_pos': None,
             'current_pos': None,
             'target_pos': None,
             'adjustment_made': None,  # 'pullback' or 'boost' or None
         }
-        self.T = 200
-        self.R = 1.05 # Pullback
-        self.S = 0.5 # Boost
-        self.Z = 45
         self.Z_exit = (False, False) # Triggered, Exit
-        self.theta = 23.2
+
+    def configure(self, constants):
+        self.constants = constants
+        self.T, self.R, self.S, self.Z, self.theta, self.mitigation = constants
     
     def reset_Z(self):
         self.Z_exit = (False, False)
 
-    def update(self, target_pos, next_target_pos):
+    # rel: raw motion of this sample if the caller already read it from the backend
+    def update(self, target_pos, next_target_pos, rel=None):
         if not target_pos:
             return
             
-        dx, dy = pygame.mouse.get_rel()
+        dx, dy = self.backend.get_rel() if rel is None else rel
         if dx == 0 and dy == 0:
             return
         
-        current_pos = pygame.mouse.get_pos()
+        current_pos = self.backend.get_pos()
         original_pos = (current_pos[0] - dx, current_pos[1] - dy)
 
         # Store debug info
@@ -103,19 +119,20 @@ class AimAssist:
             next_target_mitigation = 1.25
 
         if dist(original_pos, target_pos) < dist(current_pos, target_pos):
-            pygame.mouse.set_pos(original_pos[0] + dx * (self.R * 0.5 + percentage_0) * PYGAME_MITIGATION * next_target_mitigation,
-                                 original_pos[1] + dy * (self.R * 0.5 + percentage_0) * PYGAME_MITIGATION * next_target_mitigation)
+            self.backend.set_pos(original_pos[0] + dx * (self.R * 0.5 + percentage_0) * self.mitigation * next_target_mitigation,
+                               original_pos[1] + dy * (self.R * 0.5 + percentage_0) * self.mitigation * next_target_mitigation)
             #pygame.mouse.set_pos(original_pos[0] + dx * PYGAME_MITIGATION, original_pos[1] + dy * PYGAME_MITIGATION)
             self.debug_info['adjustment_made'] = 'pullback'
         else:
-            pygame.mouse.set_pos(current_pos[0] + dx * (self.S * 0.5 + percentage_1) * PYGAME_MITIGATION * next_target_mitigation,
-                                 current_pos[1] + dy * (self.S * 0.5 + percentage_1) * PYGAME_MITIGATION * next_target_mitigation)
+            self.backend.set_pos(current_pos[0] + dx * (self.S * 0.5 + percentage_1) * self.mitigation * next_target_mitigation,
+                               current_pos[1] + dy * (self.S * 0.5 + percentage_1) * self.mitigation * next_target_mitigation)
             #pygame.mouse.set_pos(original_pos[0] + dx * PYGAME_MITIGATION, original_pos[1] + dy * PYGAME_MITIGATION)
             self.debug_info['adjustment_made'] = 'boost'
 
     def draw_debug(self):
         if not all(self.debug_info.values()):
             return
+        import pygame
 
         # Colors
         BLUE = (0, 150, 255)
@@ -1,7 +1,18 @@
 # v2
 
+import math
+import time
+from collections import namedtuple
 import numpy as np
 
+import debuglog
+
+_debug = debuglog.get('v2')
+
+# Plain Python numbers take the math path: NumPy dispatch on 0-d values costs more than the arithmetic
+def _is_scalar(*values):
+    return all(isinstance(v, (int, float)) for v in values)
+
 def potential_energy(x, y, target_pos, U0, sigma):
     # 잠재 에너지 함수 U(x, y)
     xt, yt = target_pos
@@ -10,41 +21,127 @@ def potential_energy(x, y, target_pos, U0, sigma):
 def force_field(x, y, target_pos, U0, sigma):
     # 힘 벡터 F(x, y) = ∇U(x, y)
     xt, yt = target_pos
+    if _is_scalar(x, y, xt, yt):
+        G = U0 * math.exp(-((x - xt)**2 + (y - yt)**2) / (2 * sigma**2))
+        return -((x - xt) / sigma**2) * G, -((y - yt) / sigma**2) * G
     Fx = -((x - xt) / sigma**2) * U0 * np.exp(-((x - xt)**2 + (y - yt)**2) / (2 * sigma**2))
     Fy = -((y - yt) / sigma**2) * U0 * np.exp(-((x - xt)**2 + (y - yt)**2) / (2 * sigma**2))
     return Fx, Fy
 
 def alpha_function(d, R, n):
     # 거리 기반 가중치 함수 α(d)
+    if _is_scalar(d):
+        return 1 - (d / R)**n if d <= R else 0
     alpha = np.where(d <= R, 1 - (d / R)**n, 0)
     return alpha
 
+# Batch version of AimAssist.get_fx_fy. Inputs are broadcast against each other, so N cursors
+# against M targets is force_field_batch(x[:, None], y[:, None], x_t[None, :], y_t[None, :], ...).
+# Returns the displaced positions and the forces, like v2p1.gaussian_filter.
+def force_field_batch(x, y, x_t, y_t, U0, sigma, R, n, strength, f_mitigation=1.0):
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    ox = x - x_t
+    oy = y - y_t
+    G = U0 * np.exp(-(ox**2 + oy**2) / (2 * sigma**2))
+
+    d = np.hypot(ox, oy)
+    inside = d <= R
+    alpha = (1 - (np.minimum(d, R) / R)**n) * inside
+
+    w = -(G / sigma**2) * alpha * strength
+    Fx = ox * w
+    Fy = oy * w
+
+    # Same small-force inflation as get_fx_fy, as a multiply instead of a branch
+    Fx *= 1 + (f_mitigation - 1) * (np.abs(Fx) < 1)
+    Fy *= 1 + (f_mitigation - 1) * (np.abs(Fy) < 1)
+
+    return x + Fx, y + Fy, Fx, Fy
+
+# Tunable constants of AimAssist with the values the per-sample path needs precomputed
+# (see profiles.py). U0, sigma and R are given at res_factor 1.
+Constants = namedtuple('Constants', ['U0', 'sigma', 'R', 'n', 'strength', 'f_mitigation',
+                                     'inv_sigma2', 'inv_two_sigma2', 'inv_R', 'R2'])
+
+def compile_constants(res_factor=1.0, U0=1000.0, sigma=675.0, R=150.0, n=1.125, strength=5.0, f_mitigation=3.5):
+    U0, sigma, R = U0 * res_factor, sigma * res_factor, R * res_factor
+    return Constants(U0, sigma, R, n, strength, f_mitigation, 1 / sigma**2, 1 / (2 * sigma**2), 1 / R, R * R)
+
 class AimAssist:
-    def __init__(self, res_factor):
+    # predict: evaluate the field where the cursor will be `lead` seconds ahead (default: one
+    # 2000 Hz control period) to make up for loop and set_pos latency
+    # f_mitigation: inflates forces under 1 px that set_pos would truncate; use 1.0 with output.SubpixelMouse
+    # backend: cursor backend driven by update() (see backend.py)
+    def __init__(self, res_factor, predict=False, lead=1 / 2000, clock=time.monotonic, f_mitigation=3.5, backend=None):
         self.active = True
-        self.U0 = 1000.0 * res_factor
-        self.sigma = 675.0 * res_factor
-        self.strength = 5.0
-        self.R = 150.0 * res_factor
-        self.n = 1.125
-        self.f_mitigation = 3.5
-
-    def get_fx_fy(self, player_pos, target_pos):
-        x_in, y_in = player_pos
+        self.backend = backend
+        self.raster = None
+        self.configure(compile_constants(res_factor, f_mitigation=f_mitigation))
+
+        self.clock = clock
+        self.lead = lead
+        self.estimator = None
+        if predict:
+            from predict import MotionEstimator
+            self.estimator = MotionEstimator()
+
+    def configure(self, constants):
+        self.constants = constants
+        (self.U0, self.sigma, self.R, self.n, self.strength, self.f_mitigation,
+         self.inv_sigma2, self.inv_two_sigma2, self.inv_R, self.R2) = constants
+        if self.raster is not None:
+            self.enable_raster(self.raster.step)
 
-        Fx, Fy = force_field(x_in, y_in, target_pos, self.U0, self.sigma)
+    # Optional: evaluate the field with a bilinear lookup into a cached raster (see raster.py)
+    def enable_raster(self, step=0.5):
+        from raster import get_raster
+        self.raster = get_raster('force', (self.U0, self.sigma, self.R, self.n, self.strength), step)
 
-        d = np.hypot(x_in - target_pos[0], y_in - target_pos[1])
+    def get_fx_fy(self, player_pos, target_pos, now=None):
+        x_in, y_in = player_pos
+
+        if self.estimator is not None:
+            self.estimator.update(self.clock() if now is None else now, x_in, y_in)
+            x_in, y_in = self.estimator.predict(self.lead)
 
-        alpha = alpha_function(d, self.R, self.n)
+        if _is_scalar(x_in, y_in):
+            # force_field * alpha_function on the precomputed constants
+            ox, oy = x_in - target_pos[0], y_in - target_pos[1]
+            d2 = ox * ox + oy * oy
+            if d2 > self.R2:
+                Fx, Fy = 0.0, 0.0
+            elif self.raster is not None:
+                Fx, Fy = self.raster.lookup(ox, oy)
+            else:
+                w = (-self.U0 * self.inv_sigma2 * math.exp(-d2 * self.inv_two_sigma2)
+                     * (1 - (math.sqrt(d2) * self.inv_R)**self.n) * self.strength)
+                Fx, Fy = ox * w, oy * w
+        else:
+            Fx, Fy = force_field(x_in, y_in, target_pos, self.U0, self.sigma)
+            d = np.hypot(x_in - target_pos[0], y_in - target_pos[1])
+            alpha = alpha_function(d, self.R, self.n)
 
-        Fx *= alpha * self.strength
-        Fy *= alpha * self.strength
+            Fx *= alpha * self.strength
+            Fy *= alpha * self.strength
 
         if abs(Fx) < 1:
             Fx *= self.f_mitigation
         if abs(Fy) < 1:
             Fy *= self.f_mitigation
-        print(Fx, Fy)
+        _debug('%s %s', Fx, Fy)
+
+        return Fx, Fy
+
+    # One sample through the backend: push the cursor by the field if it moved this sample
+    # rel: raw motion of this sample if the caller already read it from the backend
+    def update(self, target_pos, now=None, rel=None):
+        dx, dy = self.backend.get_rel() if rel is None else rel
+        if target_pos is None or (dx == 0 and dy == 0):
+            return None
+        x, y = self.backend.get_pos()
+        Fx, Fy = self.get_fx_fy((x, y), target_pos, now)
+        self.backend.set_pos(x + Fx, y + Fy)
+        return Fx, Fy
 
-        return Fx, Fy
\ No newline at end of file
+    def get_fx_fy_batch(self, x, y, x_t, y_t):
+        return force_field_batch(x, y, x_t, y_t, self.U0, self.sigma, self.R, self.n, self.strength, self.f_mitigation)
\ No newline at end of file
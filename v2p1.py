@@ -2,19 +2,77 @@
 
 from cubic import MonotoneCubic
 import numpy as np
+import json
+import math
 import time
+from collections import namedtuple
+
+CUBICS = ('distance_cubic', 'time_cubic', 'speed_cubic')
+CUBIC_FIELDS = ('a', 'b', 'k1', 'k2', 'k3', 's')
+
+# Tunable constants of AimAssistV2p1 and their defaults; cubics are [a, b, k1, k2, k3, s]
+# TODO: change these values (tuning)
+DEFAULT_PARAMS = {
+    'V': 160.0,
+    'sigma': 51.9,
+    'k': 0.5,
+    'debt_paying_speed': 0.02, # multiplier (2%)
+    'time_limit': 2.0, # (seconds)
+    'distance_limit': 2000, # (pixels)
+    'speed_limit': 20, # (pixels/frame)
+    'slider_k': 0.7, # multiplier (70% than normal)
+    'distance_cubic': [175, 250, 0.5, 5.0, 0.5, 500],
+    'time_cubic': [350, 500, 0.35, 2.0, 0.1, 600],
+    'speed_cubic': [150, 350, 1, 3, 1, 500], # reversed
+}
+
+Constants = namedtuple('Constants', list(DEFAULT_PARAMS) + ['V2', 'inv_two_sigma2'])
+
+# Full parameter set: `base` (default: DEFAULT_PARAMS) overlaid with `params`, where a cubic
+# can also be changed one field at a time, e.g. {'time_cubic.k2': 2.5}
+def merge_params(params, base=None):
+    merged = {name: list(value) if name in CUBICS else value for name, value in (base or DEFAULT_PARAMS).items()}
+    for name, value in params.items():
+        cubic, _, field = name.partition('.')
+        if cubic in CUBICS and field in CUBIC_FIELDS:
+            merged[cubic][CUBIC_FIELDS.index(field)] = value
+        elif name in DEFAULT_PARAMS:
+            merged[name] = list(value) if name in CUBICS else value
+        else:
+            raise KeyError(f"Unknown parameter: {name}")
+    return merged
+
+# Immutable, precomputed form of a parameter set (missing names take the defaults): the
+# cubics come with their coefficient tables built and the filter with V^2 and 1 / 2sigma^2
+def compile_constants(params=None):
+    p = dict(DEFAULT_PARAMS)
+    p.update(params or {})
+    for name in CUBICS:
+        p[name] = MonotoneCubic(*p[name], reversed=name == 'speed_cubic').compile()
+    return Constants(V2=p['V']**2, inv_two_sigma2=1 / (2 * p['sigma']**2), **p)
+
+# Plain Python numbers take the math path: NumPy dispatch on 0-d values costs more than the arithmetic
+def _is_scalar(*values):
+    return all(isinstance(v, (int, float)) for v in values)
 
 def dist(xd, yd):
+    if _is_scalar(xd, yd):
+        return math.sqrt(xd**2 + yd**2)
     return np.sqrt(xd**2 + yd**2)
 
 def dist_between(x1, y1, x2, y2):
+    if _is_scalar(x1, y1, x2, y2):
+        return math.sqrt((x1 - x2)**2 + (y1 - y2)**2)
     return np.sqrt((x1 - x2)**2 + (y1 - y2)**2)
 
 # x, y, x_t, y_t are all "real" positions
 def gaussian_filter(x, y, x_t, y_t, V=160.0, sigma=51.9, k=0.5): # sigma ~= V / 3, k is the strength of the force
     
-    D = np.sqrt((x - x_t)**2 + (y - y_t)**2)
-    G = np.exp(-((x - x_t)**2 + (y - y_t)**2) / (2 * sigma**2)) # Gaussian function
+    if not _is_scalar(x, y, x_t, y_t):
+        return gaussian_filter_batch(x, y, x_t, y_t, V, sigma, k)
+
+    D = math.sqrt((x - x_t)**2 + (y - y_t)**2)
+    G = math.exp(-((x - x_t)**2 + (y - y_t)**2) / (2 * sigma**2)) # Gaussian function
     
     delta_x, delta_y = 0, 0
     
@@ -24,32 +82,153 @@ def gaussian_filter(x, y, x_t, y_t, V=160.0, sigma=51.9, k=0.5): # sigma ~= V /
     
     return x + delta_x, y + delta_y, delta_x, delta_y
 
+# Batch version of gaussian_filter. Inputs are broadcast against each other, so N cursors
+# against M targets is gaussian_filter_batch(x[:, None], y[:, None], x_t[None, :], y_t[None, :]).
+# The radius test is a mask instead of a branch.
+def gaussian_filter_batch(x, y, x_t, y_t, V=160.0, sigma=51.9, k=0.5):
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    ox = x_t - x
+    oy = y_t - y
+    D2 = ox**2 + oy**2
+    G = np.exp(-D2 / (2 * sigma**2))
+
+    w = k * G * (D2 <= V**2)
+    delta_x = ox * w
+    delta_y = oy * w
+
+    return x + delta_x, y + delta_y, delta_x, delta_y
+
+# The debt subsystem of AimAssistV2p1 as an incremental state machine:
+#   idle     - no previous target, or the debt is under a pixel; pays nothing
+#   ramping  - normal targets; the payment grows with time_cubic until time_limit
+#   constant - sliders, or ramping past time_limit; the per-sample payment is fixed
+# Everything that depends only on the last two targets is computed once in on_target(),
+# so pay() does a single cubic evaluation at most. Timestamps are passed in, never read.
+class DebtAccount:
+    IDLE, RAMPING, CONSTANT = 0, 1, 2
+
+    # config: any object with the cubics, limits and debt_paying_speed (normally the AimAssistV2p1)
+    def __init__(self, config):
+        self.config = config
+        self.debt = 0, 0
+        self.state = self.IDLE
+        self.start_time = None
+        self.base_ratio = 0.0
+        self.payment = 0, 0
+
+    def on_target(self, debt, now, target, last_target, last_target_time, slider=False):
+        c = self.config
+        self.debt = debt
+        self.start_time = now
+
+        if last_target is None or abs(dist(*debt)) < 1:
+            self.state = self.IDLE
+            self.payment = 0, 0
+            return
+
+        distance = dist_between(target[0], target[1], last_target[0], last_target[1])
+
+        if slider:
+            # We see only speed.
+            speed = distance / abs(now - last_target_time)
+            if speed > c.speed_limit:
+                speed = c.speed_limit
+
+            ratio = c.speed_cubic.F_as_ratio(speed / c.speed_limit * 500)
+            ratio *= c.debt_paying_speed
+            self._settle(ratio)
+        else:
+            if distance > c.distance_limit:
+                distance = c.distance_limit
+
+            self.base_ratio = c.distance_cubic.F_as_ratio(distance / c.distance_limit * 500)
+            self.state = self.RAMPING
+
+    def _settle(self, ratio):
+        self.state = self.CONSTANT
+        self.payment = ratio * self.debt[0], ratio * self.debt[1]
+
+    # Per-sample payment (dx, dy) at time `now`
+    def pay(self, now):
+        if self.state != self.RAMPING:
+            return self.payment
+
+        c = self.config
+        uptime = now - self.start_time
+        if uptime >= c.time_limit:
+            ratio = self.base_ratio * c.time_cubic.F_as_ratio(500)
+            ratio *= c.debt_paying_speed
+            self._settle(ratio)
+            return self.payment
+
+        ratio = self.base_ratio * c.time_cubic.F_as_ratio(uptime / c.time_limit * 500)
+        ratio *= c.debt_paying_speed
+        return ratio * self.debt[0], ratio * self.debt[1]
+
 class AimAssistV2p1:
-    def __init__(self):
-        self.V = 160.0
-        self.sigma = 51.9
-        self.k = 0.5
+    # predict: filter the real position `lead` seconds ahead (default: one control period)
+    # to make up for loop and set_position latency
+    # backend: cursor backend used by get_position/set_position (see backend.py)
+    def __init__(self, clock=time.monotonic, params=None, predict=False, lead=None, backend=None):
+        self.clock = clock # returns the current time in seconds
+        self.backend = backend
 
         self.framerate = 1 / 1000 / 2 # Polling rate * 2 (2000Hz)
 
-        # TODO: change these values (tuning)
-        
-        # Cubics
-        self.distance_cubic = MonotoneCubic(175, 250, 0.5, 5.0, 0.5, 500)
-        self.time_cubic = MonotoneCubic(350, 500, 0.35, 2.0, 0.1, 600)
-
-        # Reversed cubics
-        self.speed_cubic = MonotoneCubic(150, 350, 1, 3, 1, 500, reversed=True)
-        
-        self.debt_paying_speed = 0.02 # multiplier (2%)
+        self.raster = None
+        self.configure(compile_constants())
 
-        self.time_limit = 2.0 # (seconds)
-        self.distance_limit = 2000 # (pixels)
-        self.speed_limit = 20 # (pixels/frame)
+        self.lead = self.framerate if lead is None else lead
+        self.estimator = None
+        if predict:
+            from predict import MotionEstimator
+            self.estimator = MotionEstimator()
 
-        self.slider_k = 0.7 # multiplier (70% than normal)
+        if params is not None:
+            self.set_params(params)
 
         self.reset()
+
+    # Optional: evaluate gaussian_filter with a bilinear lookup into a cached raster (see raster.py)
+    def enable_raster(self, step=0.5):
+        from raster import get_raster
+        self.raster = get_raster('gaussian', (self.V, self.sigma, self.k), step)
+
+    # gaussian_filter on the precomputed constants
+    def _filter(self, x, y, x_t, y_t):
+        ox, oy = x - x_t, y - y_t
+        d2 = ox * ox + oy * oy
+        if d2 > self.V2:
+            return x, y
+        if self.raster is not None:
+            dx, dy = self.raster.lookup(ox, oy)
+            return x + dx, y + dy
+        w = -self.k * math.exp(-d2 * self.inv_two_sigma2)
+        return x + ox * w, y + oy * w
+
+    # constants: from compile_constants(); the per-sample path only reads these
+    def configure(self, constants):
+        self.constants = constants
+        for name, value in zip(constants._fields, constants):
+            setattr(self, name, value)
+        if self.raster is not None:
+            self.enable_raster(self.raster.step)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path) as f:
+            return cls(params=json.load(f), **kwargs)
+
+    # params: {'V': 150.0, 'distance_cubic': [a, b, k1, k2, k3, s], 'time_cubic.k2': 2.5, ...}
+    def set_params(self, params):
+        self.configure(compile_constants(merge_params(params, self.get_params())))
+
+    def get_params(self):
+        params = {name: getattr(self, name) for name in DEFAULT_PARAMS if name not in CUBICS}
+        for name in CUBICS:
+            c = getattr(self, name)
+            params[name] = [c.a, c.b, c.k1, c.k2, c.k3, c.s]
+        return params
     
     def reset(self):
 
@@ -61,9 +240,7 @@ class AimAssistV2p1:
 
         # The 'error' is vector between last position and real position.
         # We define 'debt' as unrecoverable 'error'.
-        self.debt = 0, 0
-        self.debt_uptime = 0.0 # (seconds)
-        self.debt_last_update_time = None
+        self.debt_account = DebtAccount(self)
 
         self.target_position = None
         self.target_time = None
@@ -73,82 +250,49 @@ class AimAssistV2p1:
 
         self.slider_enabled = False
 
+    # Cursor I/O goes through the backend; without one these do nothing and can be overridden instead
     def get_position(self):
-        pass
+        if self.backend is not None:
+            return tuple(self.backend.get_pos())
 
     def set_position(self, x, y):
-        pass
+        if self.backend is not None:
+            self.backend.set_pos(x, y)
     
     def get_target_position(self):
         return self.target_position
     
-    def set_target_position(self, x, y, is_slider_frame=False):
+    @property
+    def debt(self):
+        return self.debt_account.debt
 
-        if self.target_position == (x, y) or self.target_time == time.time():
+    def set_target_position(self, x, y, is_slider_frame=False, now=None):
+
+        if now is None:
+            now = self.clock()
+        if self.target_position == (x, y) or self.target_time == now:
             return
         
-        # Update new debt, dt
-        self.debt = self.real_position[0] - self.last_position[0], self.real_position[1] - self.last_position[1]
-        self.debt_uptime = 0
-        self.debt_last_update_time = time.time()
-
         self.last_target_position = self.target_position
         self.last_target_time = self.target_time
 
         self.target_position = x, y
-        self.target_time = time.time()
+        self.target_time = now
 
         self.slider_enabled = is_slider_frame
 
+        # Update new debt
+        debt = self.real_position[0] - self.last_position[0], self.real_position[1] - self.last_position[1]
+        self.debt_account.on_target(debt, now, self.target_position, self.last_target_position, self.last_target_time, is_slider_frame)
+
     # Calculate the mitigation by delta, and error; the vector between last position and real position
     # Returns the mitigated delta
-    def mitigate_error(self):
-        
-        if self.target_position == None or self.last_target_position == None or abs(dist(*self.debt)) < 1:
-            return 0, 0
-        
-        self.debt_uptime += time.time() - self.debt_last_update_time
-        self.debt_last_update_time = time.time()
-
-        if self.slider_enabled:
-            
-            # We see only speed.
-            speed = dist_between(self.target_position[0], self.target_position[1], self.last_target_position[0], self.last_target_position[1]) / abs(self.target_time - self.last_target_time)
-            if speed > self.speed_limit:
-                speed = self.speed_limit
-
-            # Calculate the force
-            ratio = self.speed_cubic.F_as_ratio(speed / self.speed_limit * 500)
-            ratio *= self.debt_paying_speed
-
-            # Calculate the delta
-            dx, dy = ratio * self.debt[0], ratio * self.debt[1]
-
-            return dx, dy
-
-        else:
-
-            # Calculate the force
-            distance = dist_between(self.target_position[0], self.target_position[1], self.last_target_position[0], self.last_target_position[1])
-            if distance > self.distance_limit:
-                distance = self.distance_limit
-
-            ratio = self.distance_cubic.F_as_ratio(distance / self.distance_limit * 500)
-
-            time = self.debt_uptime
-            if time > self.time_limit:
-                time = self.time_limit
-
-            ratio *= self.time_cubic.F_as_ratio(time / self.time_limit * 500)
-            ratio *= self.debt_paying_speed
-
-            # Calculate the delta
-            dx, dy = ratio * self.debt[0], ratio * self.debt[1]
-
-            return dx, dy
+    def mitigate_error(self, now=None):
+        return self.debt_account.pay(self.clock() if now is None else now)
 
     # The delta is 'not' occured, so we change the force before the change occurs
-    def update_as_delta(self, dx, dy):
+    # now: the sample's timestamp, read from the clock if not given
+    def update_as_delta(self, dx, dy, now=None):
 
         if self.target_position == None or (dx == 0 and dy == 0):
             return
@@ -158,54 +302,32 @@ class AimAssistV2p1:
             dy *= self.slider_k
 
         # TODO: add exception handling
-        self.real_position[0] += dx
-        self.real_position[1] += dy
-
-        cx, cy, _, _ = gaussian_filter(self.real_position[0], self.real_position[1], self.target_position[0], self.target_position[1])
+        self.real_position = self.real_position[0] + dx, self.real_position[1] + dy
+        rx, ry = self.real_position
+
+        if self.estimator is not None:
+            if now is None:
+                now = self.clock()
+            self.estimator.update(now, rx, ry)
+            # Correction for where the cursor is heading, applied to where it is
+            px, py = self.estimator.predict(self.lead)
+            cx, cy = self._filter(px, py, self.target_position[0], self.target_position[1])
+            cx, cy = cx - px + rx, cy - py + ry
+        else:
+            cx, cy = self._filter(rx, ry, self.target_position[0], self.target_position[1])
 
         self.last_position = cx, cy
-        mdx, mdy = self.mitigate_error(dx, dy)
+        mdx, mdy = self.mitigate_error(now)
         self.last_position = cx + mdx, cy + mdy
         self.set_position(cx + mdx, cy + mdy)
 
-    def update(self):
+    def update(self, now=None):
         
-        if self.target_position == None or self.last_position == self.get_position():
+        if self.target_position == None:
             return
-        
-        dx, dy = self.get_position() - self.last_position
-
-        self.update_as_delta(dx, dy)
-
-
-import matplotlib.pyplot as plt
-
-def Visualize_F():
-    x = np.linspace(0, 1920, 60)
-    y = np.linspace(0, 1080, 40)
-    X, Y = np.meshgrid(x, y)
 
-    # Calculate new positions
-    X_new = np.zeros_like(X)
-    Y_new = np.zeros_like(Y)
-
-    for i in range(40):
-        for j in range(60):
-            X_new[i,j], Y_new[i,j], _, _ = gaussian_filter(X[i,j], Y[i,j], 720, 500)
-
-    plt.figure(figsize=(19.2, 10.8))
-    plt.scatter(X_new, Y_new, c='blue', label='Points')
-    plt.scatter(X, Y, c='red', label='Points')
-
-    circle = plt.Circle((720, 500), 160.0, fill=False, color='green', linestyle='--', label='V radius')
-    plt.gca().add_patch(circle)
-
-    plt.plot(720, 500, 'r*', markersize=15, label='Target')
-    plt.grid(True)
-    plt.legend()
-    plt.title('Force Field Visualization')
-    plt.xlabel('X')
-    plt.ylabel('Y')
-    plt.show()
-
-Visualize_F()
\ No newline at end of file
+        x, y = self.get_position()
+        if (x, y) == self.last_position:
+            return
+        
+        self.update_as_delta(x - self.last_position[0], y - self.last_position[1], now)
@@ -0,0 +1,66 @@
+# Plots of the engine's curves and fields
+#
+# Kept out of the engine modules so that importing them never pulls in matplotlib;
+# matplotlib is only imported when a plot is actually drawn.
+#
+#   python visualize.py cubic
+#   python visualize.py v2p1
+
+import sys
+
+import numpy as np
+
+from cubic import MonotoneCubic
+from v2p1 import gaussian_filter_batch
+
+def plot_cubic(cubic):
+    import matplotlib.pyplot as plt
+
+    a, b, s = cubic.a, cubic.b, cubic.s
+    x = np.linspace(0, s, s)
+    y = cubic.F(x)
+
+    plt.figure(figsize=(10, 6))
+    plt.plot(x, y, label='Monotonic Cubic Function (PCHIP)', color='blue')
+    plt.axvline(x=a, color='red', linestyle='--', label='a (전환점)')
+    plt.axvline(x=b, color='green', linestyle='--', label='b (전환점)')
+    plt.scatter([0, a, b, s], [cubic.F(0), cubic.F(a), cubic.F(b), cubic.F(s)], color='black')  # 키 포인트 표시
+    plt.xlabel('x')
+    plt.ylabel('f(x)')
+    plt.title('Monotonic Cubic S-Shaped Function using PCHIP')
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+def Visualize_F():
+    import matplotlib.pyplot as plt
+
+    x = np.linspace(0, 1920, 60)
+    y = np.linspace(0, 1080, 40)
+    X, Y = np.meshgrid(x, y)
+
+    # Calculate new positions
+    X_new, Y_new, _, _ = gaussian_filter_batch(X, Y, 720, 500)
+
+    plt.figure(figsize=(19.2, 10.8))
+    plt.scatter(X_new, Y_new, c='blue', label='Points')
+    plt.scatter(X, Y, c='red', label='Points')
+
+    circle = plt.Circle((720, 500), 160.0, fill=False, color='green', linestyle='--', label='V radius')
+    plt.gca().add_patch(circle)
+
+    plt.plot(720, 500, 'r*', markersize=15, label='Target')
+    plt.grid(True)
+    plt.legend()
+    plt.title('Force Field Visualization')
+    plt.xlabel('X')
+    plt.ylabel('Y')
+    plt.show()
+
+if __name__ == "__main__":
+    what = sys.argv[1] if len(sys.argv) > 1 else 'v2p1'
+    if what == 'cubic':
+        # 파라미터 설정: a, b (전환점), k1, k2, k3 (구간 기울기), s
+        plot_cubic(MonotoneCubic(150, 350, 1, 3, 1, 500, reversed=True))
+    else:
+        Visualize_F()